@@ -0,0 +1,128 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+BenchmarkImportExtinctionRecallTaskLog.py
+
+Write a synthetic Extinction Recall 3 log of a given length and time how long
+ImportExtinctionRecallTaskLog takes to import it.
+
+Usage: python BenchmarkImportExtinctionRecallTaskLog.py --nLines 100000
+
+Created 10/16/26 by DJ.
+"""
+
+# Import packages
+import time           # for timing analyses
+import random         # for synthetic ratings and keys
+import argparse       # for command-line arguments
+import tempfile       # for the synthetic log's folder
+import shutil         # for cleaning up
+import os             # for handling paths
+import ImportExtinctionRecallTaskLog as er
+
+# Write the lines of a single VAS (display, keypresses, rating, RT, history) to the log
+def WriteVas(f,t,name,nKeys):
+    f.write('%.4f \tEXP \tDisplay %s\n'%(t,name))
+    tStart = t
+    history = [(50, 0.0)]
+    for iKey in range(nKeys):
+        t += 0.1
+        f.write('%.4f \tDATA \tKeypress: %s\n'%(t,random.choice(['1','2'])))
+        history.append((random.randint(0,100), round(t-tStart,4)))
+    t += 0.1
+    f.write('%.4f \tDATA \tKeypress: 3\n'%t)
+    f.write('%.4f \tDATA \tRatingScale %s: rating=%d\n'%(t,name,history[-1][0]))
+    f.write('%.4f \tDATA \tRatingScale %s: rating RT=%.3f\n'%(t,name,t-tStart))
+    f.write('%.4f \tDATA \tRatingScale %s: history=%s\n'%(t,name,history))
+    return t, nKeys+5
+
+# Write a synthetic ER3 log with (approximately) nLines lines
+def WriteSyntheticLog(logFile,nLines=100000,nKeysPerVas=20):
+
+    questionDir = os.path.join(os.path.dirname(os.path.abspath(__file__)),'Questions')
+    params = {'subject':1, 'session':1, 'date':'Oct_16_1200', 'triggerKey':'t',
+              'moodQuestionFile1':os.path.join(questionDir,'ERVas1RatingScales.txt'),
+              'moodQuestionFile2':os.path.join(questionDir,'ERVasRatingScales.txt'),
+              'moodQuestionFile3':os.path.join(questionDir,'ERVasRatingScales.txt'),
+              'moodQuestionFile4':os.path.join(questionDir,'ERVas4RatingScales.txt'),
+              'respKeys':['1','2','3']}
+    random.seed(0)
+    with open(logFile,'w') as f:
+        # parameters
+        f.write('1.0000 \tINFO \t---START PARAMETERS---\n')
+        for key in sorted(params.keys()):
+            f.write('1.0000 \tINFO \t%s: %s\n'%(key,params[key]))
+        f.write('1.0000 \tINFO \t---END PARAMETERS---\n')
+        iLine = len(params)+2
+        t = 2.
+        # mood VAS before the sound check
+        for iQ in range(6):
+            t,n = WriteVas(f,t+1,'PreSoundCheck-%d'%iQ,nKeysPerVas)
+            iLine += n
+        for iQ in range(3):
+            t,n = WriteVas(f,t+1,'SoundCheck%d-0'%(iQ+1),nKeysPerVas)
+            iLine += n
+        # runs of image trials until the file is long enough
+        iRun = 0
+        while iLine<nLines:
+            iRun +=1
+            f.write('%.4f \tEXP \t===== START RUN =====\n'%t)
+            f.write('%.4f \tEXP \tDisplay WaitingForScanner\n'%(t+0.5))
+            t += 1
+            f.write('%.4f \tDATA \tKeypress: 5\n'%t)
+            iLine += 3
+            for iGroup in range(4):
+                f.write('%.4f \tEXP \t==== START GROUP %d/4 ====\n'%(t,iGroup+1))
+                iLine += 1
+                for iBlock in range(2):
+                    blockType = ['AFRAID','SCREAM'][iBlock]
+                    f.write('%.4f \tEXP \t=== START BLOCK %d/2 TYPE %d ===\n'%(t,iBlock+1,iBlock))
+                    f.write('%.4f \tEXP \tbottomMsg: text = \'HOW %s?\'\n'%(t,blockType))
+                    f.write('%.4f \tEXP \tset port 0x378 to %d\n'%(t,iBlock+1))
+                    iLine += 3
+                    for iTrial in range(6):
+                        t += 1
+                        cs = random.choice([0,25,50,75,100])
+                        f.write('%.4f \tEXP \tDisplay Faces/R%d_B%d.jpg CSplus%d\n'%(t,cs,100-cs,cs))
+                        t,n = WriteVas(f,t+1,'ImageRating0',nKeysPerVas)
+                        f.write('%.4f \tEXP \tDisplay Fixation\n'%(t+0.5))
+                        iLine += n+2
+                    f.write('%.4f \tEXP \t=== END BLOCK %d/2 TYPE %d ===\n'%(t,iBlock+1,iBlock))
+                    iLine += 1
+            f.write('%.4f \tEXP \t===== END RUN =====\n'%t)
+            iLine += 1
+            for iQ in range(6):
+                t,n = WriteVas(f,t+1,'PostRun%d-%d'%(iRun,iQ),nKeysPerVas)
+                iLine += n
+    return iLine
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Benchmark ImportExtinctionRecallTaskLog on a synthetic log file.')
+parser.add_argument('--nLines', type=int, default=100000, help='approximate number of lines in the synthetic log')
+parser.add_argument('--nRepeats', type=int, default=3, help='number of times to import the log')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    tempDir = tempfile.mkdtemp()
+    try:
+        logFile = os.path.join(tempDir,'ER3_1-1-Oct_16_1200.log')
+        nLines = WriteSyntheticLog(logFile,args.nLines)
+        nMB = os.path.getsize(logFile)/1e6
+        print('Wrote %d-line (%.1f MB) synthetic log %s.'%(nLines,nMB,logFile))
+
+        for fnName in ['ImportExtinctionRecallTaskLog','ImportExtinctionRecallTaskLog_VasOnly']:
+            tElapsed = []
+            for iRep in range(args.nRepeats):
+                t = time.time()
+                getattr(er,fnName)(logFile)
+                tElapsed.append(time.time()-t)
+            tBest = min(tElapsed)
+            print('=== %s: best of %d = %.3f s (%.0f lines/s, %.1f MB/s)'%(fnName,args.nRepeats,tBest,nLines/tBest,nMB/tBest))
+    finally:
+        shutil.rmtree(tempDir)
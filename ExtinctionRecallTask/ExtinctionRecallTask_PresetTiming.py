@@ -24,6 +24,8 @@ Updated 4/26/19 by DJ - renamed tPreStartup->tGetReady and tStartup->tRestInstru
 Updated 6/3/19 by GF - added reminder prompt after sound VAS
 Updated 6/20-25/19 by DJ - switched to _PresetTiming version that reads in timing files
 Updated 6/25/19 by DJ - cleaned up unnecesary code
+Updated 10/16/26 by DJ - build the image rating scales before each run starts (PrepareVas), so each rating starts on time
+Updated 10/16/26 by DJ - VAS results are also saved as typed records in <log name>-VasResults.dat (see GeneralTools/VasResults.py)
 """
 
 # Import packages
@@ -33,8 +35,10 @@ import time as ts, numpy as np # for timing and array operations
 import pandas as pd # for timing file importing/manipulation
 import io # for reading files with specified newlines
 import os # for file manipulation
+import atexit # for closing the VAS result file on exit
 import BasicPromptTools # for loading/presenting prompts and questions
 import RatingScales # for VAS sliding scale
+import VasResults # for saving typed VAS results
 
 # ====================== #
 # ===== PARAMETERS ===== #
@@ -172,6 +176,8 @@ toFile('%s-lastExpInfo.psydat'%scriptName, expInfo) #save params to file for nex
 dateStr = ts.strftime("%m-%d-%Y", ts.localtime()) # add the current time
 logFilename = 'Logs/ER3_%s-%d_%s.log'%(expInfo['subject'], expInfo['session'], dateStr) # log filename
 logging.LogFile((logFilename), level=logging.INFO)#, mode='w') # w=overwrite
+vasResultFile = VasResults.VasResultFile(VasResults.GetVasResultFile(logFilename)) # typed VAS results, read by the log importer
+atexit.register(vasResultFile.Close) # close it however the task exits (CoolDown's core.quit, or an error)
 logging.log(level=logging.INFO, msg='---START PARAMETERS---')
 logging.log(level=logging.INFO, msg='filename: %s'%logFilename)
 logging.log(level=logging.INFO, msg='subject: %s'%expInfo['subject'])
@@ -415,7 +421,7 @@ def RunVas(questions,options,pos=(0.,-0.25),scaleTextPos=[0.,0.25],questionDur=f
         upKey=params['questionUpKey'], downKey=params['questionDownKey'], selectKey=params['questionSelectKey'],\
         isEndedByKeypress=isEndedByKeypress, textColor=params['vasTextColor'], name=name, pos=pos,\
         scaleTextPos=scaleTextPos, labelYPos=pos[1]-params['vasLabelYDist'], markerSize=params['vasMarkerSize'],\
-        tickHeight=1,tickLabelWidth = 0.9)
+        tickHeight=1,tickLabelWidth = 0.9, resultFile=vasResultFile)
     
     # Update next stim time
     if isEndedByKeypress:
@@ -424,6 +430,15 @@ def RunVas(questions,options,pos=(0.,-0.25),scaleTextPos=[0.,0.25],questionDur=f
         AddToFlipTime(questionDur*len(questions)) # add question duration * # of questions
 
 
+# Build the rating scales for a set of VAS questions before they're needed (layout inputs must match RunVas)
+def PrepareVas(questions,options,pos=(0.,-0.25),scaleTextPos=[0.,0.25]):
+    RatingScales.PrepareVAS(questions,options, win, \
+        upKey=params['questionUpKey'], downKey=params['questionDownKey'], selectKey=params['questionSelectKey'],\
+        textColor=params['vasTextColor'], pos=pos,\
+        scaleTextPos=scaleTextPos, labelYPos=pos[1]-params['vasLabelYDist'], markerSize=params['vasMarkerSize'],\
+        tickHeight=1,tickLabelWidth = 0.9)
+
+
 def RunMoodVas(questions,options,name='MoodVas'):
     
     # Wait until it's time
@@ -455,6 +470,8 @@ def RunSoundVas(questions_postsoundcheck,options_postsoundcheck,name='SoundVas')
 
 
 def DoRun(allImages,allCodes,allNames,dfRunTiming):
+    # build image rating scales
+    PrepareVas(questions,options)
     # wait for scanner
     WaitForScanner() # includes SetFlipTimeToNow
     # Log state of experiment
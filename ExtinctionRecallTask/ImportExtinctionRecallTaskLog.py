@@ -13,21 +13,55 @@ Updated 4/12/19 by DJ - updated to work from command line and with new task vers
 Updated 5/2/19 by DJ - added function to write BIDs-formatted events files,
   added --makeBids flag to argparser, added run & tEnd columns to dfBlock.
 Updated 9/24/19 by DJ - accommodate ratingscales with no locked-in response, removed old/redundant mood VAS categorization.
+Updated 10/16/26 by DJ - single-pass ParseErLog collects rows in lists and builds each table once (was quadratic),
+  shared by both import functions. Added BenchmarkImportExtinctionRecallTaskLog.py.
+Updated 10/16/26 by DJ - added --jobs flag and ProcessERLogs to process logs in parallel, writing the
+  cross-subject VAS tables once at the end (AppendToVasTable).
+Updated 10/16/26 by DJ - added processing manifest (ER3-ProcessingManifest.json in the Processed folder)
+  so unchanged logs are skipped, added --allSubjects and --force flags.
+Updated 10/16/26 by DJ - cross-subject mood/sound VAS rows now go in an SQLite store (ER3-VasTables.sqlite)
+  keyed on subject & session instead of rewriting the Excel tables, added --exportExcel flag.
+Updated 10/16/26 by DJ - ParseErLog now streams the log with GeneralTools/LogTools.py.
+Updated 10/16/26 by DJ - added --indexLogs flag (see GeneralTools/LogIndex.py).
+Updated 10/16/26 by DJ - WriteBidsEventsFiles assigns events to runs with np.searchsorted instead of per-run masks.
+Updated 10/16/26 by DJ - figures drawn offscreen (Agg) with matplotlib imported on first use and figures reused,
+  added --noFigures and --figureJobs flags (VasFigureRenderer saves figures in background processes).
+Updated 10/16/26 by DJ - GetVasTypes reads question files with GeneralTools/QuestionBank.py (cached).
+Updated 10/16/26 by DJ - if a log has a typed VAS result file (<log name>-VasResults.dat, see GeneralTools/VasResults.py),
+  VAS ratings, RTs and times to first press are read from it instead of parsed out of the log text
+  (unless its record count doesn't match the log's VASs: then it's skipped with a warning).
+  The processing manifest records the VAS result file too, so a log is reprocessed if it appears or changes.
 """
 
 # Import packages
 import time           # for timing analyses
 import numpy as np    # for math
 import pandas as pd   # for tables
-from matplotlib import pyplot as plt # for plotting
-import ast            # for parameter parsing
 import re             # for splitting strings
 import argparse       # for command-line arguments
 from glob import glob # for finding files
 import os             # for handling paths
-
-# Import full log (including keypresses)
-def ImportExtinctionRecallTaskLog(logFile):
+import multiprocessing # for processing logs in parallel
+import hashlib        # for detecting changed logs
+import json           # for the processing manifest
+import sqlite3        # for the cross-subject VAS store
+try:
+    import LogTools   # for streaming PsychoPy logs (in GeneralTools)
+except ImportError:   # if GeneralTools isn't on the path, use the copy in this repository
+    import sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'..','GeneralTools'))
+    import LogTools
+import LogIndex       # for indexing log parameters and run/block markers (in GeneralTools)
+import QuestionBank   # for reading (cached) question files (in GeneralTools)
+import VasResults     # for reading typed VAS results (in GeneralTools)
+
+# Read an ER3 log in a single pass (with LogTools.ReadLog), collecting the rows of each table in plain lists.
+# The DataFrames are built once at the end, since growing them row by row with .loc is quadratic.
+# Columns are kept as object dtype so values (e.g. CSplusPercent ints) print exactly as before.
+# If vasFile (a VasResults file written by the task) is given, each VAS's rating, RT and time to first press come
+# from its records instead of the log's rating/RT/history lines. If its records don't line up with the log's VASs
+# (e.g. a restarted session appended extra records), the log is parsed again without it.
+def ParseErLog(logFile,includeKeys=True,vasFile=None):
 
     # === Read in PsychoPy log
 
@@ -35,133 +69,167 @@ def ImportExtinctionRecallTaskLog(logFile):
     print('Reading file %s...'%logFile)
     t = time.time()
 
-    # Load file
-    with open(logFile) as f:
-        allLines = f.read().splitlines(True)
-
-    # Set up outputs
-    dfKey = pd.DataFrame(columns=['t','key'])
-    dfDisp = pd.DataFrame(columns=['t','stim','CS'])
-    dfSync = pd.DataFrame(columns=['t','value'])
-    dfBlock = pd.DataFrame(columns=['tStart','tEnd','type','run'])
-    dfVas = pd.DataFrame(columns=['imageFile','CSplusPercent','type','name','rating','timeToFirstPress','RT','run','group','block','trial','tImage','tStart','tEnd'])
+    # Set up column lists for each output table
+    keyCols = {'t':[], 'key':[]}
+    dispCols = {'t':[], 'stim':[], 'CS':[]}
+    syncCols = {'t':[], 'value':[]}
+    blockCols = {'tStart':[], 'tEnd':[], 'type':[], 'run':[]}
+    vasRows = [] # one dict per VAS, since fields are filled in over several lines
     params = {}
-    iKey = 0;
-    iDisp = 0;
-    iSync = 0;
     iVas = 0;
     iBlock = -1;
     run = 0; # 1-based numbering
     group = 0
     block = 0
     trial = 0
-    isParams = False;
-
-    # Read each line
-    for line in allLines:
-        # split into parts
-        data = line.split()
-
-        # Find params
-        if 'START PARAMETERS' in line:
-            isParams = True;
-        elif 'END PARAMETERS' in line:
-            isParams = False;
-
-        # Parse params
-        elif isParams: # parse parameter
-            key = data[2][:-1] # name of parameter
-            if len(data)==4:
-                try:
-                    params[key] = float(data[3]) # if it's a number, convert to a float
-                except ValueError:
-                    params[key] = data[3] # otherwise, record the string
-            elif data[3].startswith("["):
-                params[key] = ast.literal_eval(''.join(data[3:])) # if the parameter is a list, make it a list variable
+
+    # read typed VAS results
+    if vasFile is not None:
+        try:
+            vasRecords,_,_ = VasResults.ReadVasResultFile(vasFile)
+        except ValueError as err: # e.g. written by a newer version
+            print('WARNING: %s Reading VAS results from the log instead.'%err)
+            vasFile = None
+
+    # get the VAS row currently being filled in (adding it if needed)
+    def GetVasRow(iVas):
+        while len(vasRows)<=iVas:
+            vasRows.append({})
+        return vasRows[iVas]
+
+    # Read each log entry (streamed, so the whole file is never in memory)
+    for event in LogTools.ReadLog(logFile):
+        if event.kind=='Params':
+            params = event.value
+        elif event.kind=='Keypress': # time and key pressed
+            if includeKeys:
+                keyCols['t'].append(event.t)
+                keyCols['key'].append(event.name)
+        elif event.kind=='Display': # time and stim presented
+            dispCols['t'].append(event.t)
+            dispCols['stim'].append(event.name)
+            if event.value is not None: # if a CS level is specified...
+                trial +=1
+                CS = event.value.split()[0]
+                dispCols['CS'].append(CS) # log it
+                # set VAS stimulus and type
+                thisVas = GetVasRow(iVas)
+                thisVas['tImage'] = event.t
+                thisVas['imageFile'] = event.name
+                thisVas['CSplusPercent'] = int(CS[6:])
+                thisVas['type'] = blockCols['type'][iBlock]
             else:
-                params[key] = ' '.join(data[3:])
-
-        # Parse data
-        elif len(data)>2:
-            if data[2]=='Keypress:': # time and key pressed
-                dfKey.loc[iKey,'t'] = float(data[0])
-                dfKey.loc[iKey,'key'] = data[3]
-                iKey +=1;
-            elif data[2]=='Display': # time and stim presented
-                dfDisp.loc[iDisp,'t'] = float(data[0])
-                dfDisp.loc[iDisp,'stim'] = data[3]
-                if len(data)>4: # if a CS level is specified...
-                    trial +=1
-                    dfDisp.loc[iDisp,'CS'] = data[4] # log it
-                    # set VAS stimulus and type
-                    dfVas.loc[iVas,'tImage'] = dfDisp.loc[iDisp,'t']
-                    dfVas.loc[iVas,'imageFile'] = dfDisp.loc[iDisp,'stim']
-                    dfVas.loc[iVas,'CSplusPercent'] = int(dfDisp.loc[iDisp,'CS'][6:])
-                    dfVas.loc[iVas,'type'] = dfBlock.loc[iBlock,'type']
-                iDisp +=1;
-            elif data[2]=='set': # message time and text
-                dfSync.loc[iSync,'t'] = float(data[0])
-                dfSync.loc[iSync,'value'] = float(data[-1])
-                iSync +=1;
-            elif data[2]=='=====' and data[3]=='START' and data[4]=='RUN':
-                run +=1
-            elif data[2]=='====' and data[3]=='START' and data[4]=='GROUP':
-                group = int(data[5][0])
-            elif data[2]=='===' and data[3]=='START' and data[4]=='BLOCK': # block start time
-                block = int(data[5][0])
-                trial = 0
-                iBlock +=1;
-                dfBlock.loc[iBlock,'tStart'] = float(data[0])
-                dfBlock.loc[iBlock,'run'] = run
-            elif data[2]=='===' and data[3]=='END' and data[4]=='BLOCK': # block end time
-                dfBlock.loc[iBlock,'tEnd'] = float(data[0])
-            elif data[2]=='bottomMsg:':
-                if 'AFRAID' in line:
-                    dfBlock.loc[iBlock,'type'] = 'afraid'
-                elif 'SCREAM' in line:
-                    dfBlock.loc[iBlock,'type'] = 'scream'
-            elif data[2]=='RatingScale': # VAS time, rating, RT
-                if "rating=" in line:
-                    dfVas.loc[iVas,'tStart'] = dfDisp.loc[iDisp-1,'t']
-                    dfVas.loc[iVas,'tEnd'] = float(data[0])
-                    dfVas.loc[iVas,'name'] = data[3][:-1]
-                    value = float(data[-1].split("=")[-1])
-                    dfVas.loc[iVas,'rating'] = value
-                    # if it's an image vas, set indices
-                    if dfVas.loc[iVas,'type'] in ['afraid','scream']:
-                        dfVas.loc[iVas,'run'] = run
-                        dfVas.loc[iVas,'group'] = group
-                        dfVas.loc[iVas,'block'] = block
-                        dfVas.loc[iVas,'trial'] = trial
-                    # if the response timed out, advance without RT/history
-                    if "timed out" in line:
-                        dfVas.loc[iVas,'RT'] = np.nan;
-                        # infer time to first keypress from                         
-                        iKeys = np.where((dfKey.t>dfVas.loc[iVas,'tStart']) & (dfKey.key!=str(params['triggerKey'])[0]))[0]
-                        if len(iKeys)>0:
-                            dfVas.loc[iVas,'timeToFirstPress'] = dfKey.loc[iKeys[0],'t'] - dfVas.loc[iVas,'tStart'];
-                        else:
-                            dfVas.loc[iVas,'timeToFirstPress'] = np.nan;
-                        if dfVas.loc[iVas,'type'] in ['afraid','scream']:
-                            print('WARNING: image rating scale at t=%g (run %d group %d block %d trial %d) timed out! RT will be set to NaN, timeToFirstPress inferred from key-display interval.'%(dfVas.loc[iVas,'tStart'],run,group,block,trial))
-                        else:
-                            print('WARNING: mood rating scale at t=%g timed out! RT will be set to NaN, timeToFirstPress inferred from key-display interval.'%(dfVas.loc[iVas,'tStart']))
-                        # increment VAS index
-                        iVas +=1;
-                elif "RT=" in line:
-                    value = float(data[-1].split("=")[-1])
-                    dfVas.loc[iVas,'RT'] = value
-                elif "history=" in line:
-                    # get time to first button presss
-                    if len(re.split('\), |, |\)]',line))>3:
-                        timeToPress = float(re.split('\), |, |\)]',line)[3])
+                dispCols['CS'].append(np.nan)
+        elif event.kind=='SetPort': # message time and value
+            if includeKeys:
+                syncCols['t'].append(event.t)
+                syncCols['value'].append(event.value)
+        elif event.kind=='RatingScale': # VAS time, rating, RT
+            result = event.value
+            if "rating=" in result:
+                thisVas = GetVasRow(iVas)
+                thisVas['tStart'] = dispCols['t'][-1]
+                thisVas['tEnd'] = event.t
+                thisVas['name'] = event.name
+                if vasFile is None:
+                    value = float(result.split()[-1].split("=")[-1])
+                    thisVas['rating'] = value
+                # if it's an image vas, set indices
+                isImageVas = thisVas.get('type') in ['afraid','scream']
+                if isImageVas:
+                    thisVas['run'] = run
+                    thisVas['group'] = group
+                    thisVas['block'] = block
+                    thisVas['trial'] = trial
+                # if the response timed out, advance without RT/history
+                if "timed out" in result:
+                    thisVas['RT'] = np.nan;
+                    if includeKeys:
+                        # infer time to first keypress from the keys logged so far
+                        triggerKey = str(params['triggerKey'])[0]
+                        thisVas['timeToFirstPress'] = np.nan;
+                        for tKey,keyName in zip(keyCols['t'],keyCols['key']):
+                            if tKey>thisVas['tStart'] and keyName!=triggerKey:
+                                thisVas['timeToFirstPress'] = tKey - thisVas['tStart'];
+                                break
+                        ttfpMsg = 'timeToFirstPress inferred from key-display interval'
+                    else:
+                        # NOTE: nan indicates unknown, not lack of keypress!
+                        thisVas['timeToFirstPress'] = np.nan;
+                        ttfpMsg = None
+                    if isImageVas:
+                        vasMsg = 'image rating scale at t=%g (run %d group %d block %d trial %d) timed out!'%(thisVas['tStart'],run,group,block,trial)
                     else:
-                        timeToPress = dfVas.loc[iVas,'RT'] # if no press, default to RT
-                    dfVas.loc[iVas,'timeToFirstPress'] = timeToPress
+                        vasMsg = 'mood rating scale at t=%g timed out!'%(thisVas['tStart'])
+                    if ttfpMsg is None:
+                        print('WARNING: %s RT and timeToFirstPress will be set to NaN.'%vasMsg)
+                    else:
+                        print('WARNING: %s RT will be set to NaN, %s.'%(vasMsg,ttfpMsg))
                     # increment VAS index
                     iVas +=1;
+            elif "RT=" in result:
+                if vasFile is None:
+                    value = float(result.split()[-1].split("=")[-1])
+                    GetVasRow(iVas)['RT'] = value
+            elif "history=" in result:
+                thisVas = GetVasRow(iVas)
+                # get time to first button presss
+                if vasFile is None:
+                    if len(re.split('\\), |, |\\)]',result))>3:
+                        timeToPress = float(re.split('\\), |, |\\)]',result)[3])
+                    else:
+                        timeToPress = thisVas.get('RT',np.nan) # if no press, default to RT
+                    thisVas['timeToFirstPress'] = timeToPress
+                # increment VAS index
+                iVas +=1;
+        else: # other messages: run/group/block markers and block type
+            data = event.msg.split()
+            if len(data)<3:
+                continue
+            elif data[0]=='=====' and data[1]=='START' and data[2]=='RUN':
+                run +=1
+            elif data[0]=='====' and data[1]=='START' and data[2]=='GROUP':
+                group = int(data[3][0])
+            elif data[0]=='===' and data[1]=='START' and data[2]=='BLOCK': # block start time
+                block = int(data[3][0])
+                trial = 0
+                iBlock +=1;
+                blockCols['tStart'].append(event.t)
+                blockCols['tEnd'].append(np.nan)
+                blockCols['type'].append(np.nan)
+                blockCols['run'].append(run)
+            elif data[0]=='===' and data[1]=='END' and data[2]=='BLOCK': # block end time
+                blockCols['tEnd'][iBlock] = event.t
+            elif data[0]=='bottomMsg:' and iBlock>=0:
+                if 'AFRAID' in event.msg:
+                    blockCols['type'][iBlock] = 'afraid'
+                elif 'SCREAM' in event.msg:
+                    blockCols['type'][iBlock] = 'scream'
+
+    # Fill in VAS results from their typed records (one per VAS, in order)
+    if vasFile is not None:
+        if len(vasRecords)!=len(vasRows):
+            print('WARNING: %s has %d VAS records, but %s has %d VASs! Reading VAS results from the log instead.'%(vasFile,len(vasRecords),logFile,len(vasRows)))
+            return ParseErLog(logFile,includeKeys=includeKeys,vasFile=None)
+        for thisVas,record in zip(vasRows,vasRecords):
+            thisVas['rating'] = float(record['rating'])
+            if not record['timedOut']: # timed-out VASs have NaN RT & a time to first press inferred from keys (above)
+                thisVas['RT'] = float(record['RT'])
+                thisVas['timeToFirstPress'] = float(record['timeToFirstPress'])
+
+    # Build each table once
+    dfKey = pd.DataFrame(keyCols,columns=['t','key'],dtype=object)
+    dfDisp = pd.DataFrame(dispCols,columns=['t','stim','CS'],dtype=object)
+    dfSync = pd.DataFrame(syncCols,columns=['t','value'],dtype=object)
+    dfBlock = pd.DataFrame(blockCols,columns=['tStart','tEnd','type','run'],dtype=object)
+    dfVas = pd.DataFrame(vasRows,columns=['imageFile','CSplusPercent','type','name','rating','timeToFirstPress','RT','run','group','block','trial','tImage','tStart','tEnd'],dtype=object)
     print('Done! Took %.1f seconds.'%(time.time()-t))
 
+    return params, dfVas, dfKey, dfDisp, dfSync, dfBlock
+
+
+# Split the full VAS table into mood, sound and image VAS tables
+def SplitVasTable(params,dfVas,logFile):
 
     print('Extracting VAS data...')
     t = time.time()
@@ -190,159 +258,33 @@ def ImportExtinctionRecallTaskLog(logFile):
 
     print('Done! Took %.1f seconds.'%(time.time()-t))
 
-    # Return results
-    return params, dfMoodVas, dfSoundVas, dfImageVas, dfKey, dfDisp, dfSync, dfBlock
-
-
-
-# Import VAS parts of log (excluding keypresses)
-def ImportExtinctionRecallTaskLog_VasOnly(logFile):
-
-    # === Read in PsychoPy log
-
-    # Log start
-    print('Reading file %s...'%logFile)
-    t = time.time()
+    return dfMoodVas, dfSoundVas, dfImageVas
 
-    # Load file
-    with open(logFile) as f:
-        allLines = f.read().splitlines(True)
 
-    # Set up outputs
-    dfDisp = pd.DataFrame(columns=['t','stim','CS'])
-    dfBlock = pd.DataFrame(columns=['tStart','tEnd','type'])
-    dfVas = pd.DataFrame(columns=['imageFile','CSplusPercent','type','name','rating','timeToFirstPress','RT','run','group','block','trial','tImage','tStart','tEnd'])
-    params = {}
-    iDisp = 0;
-    iVas = 0;
-    iBlock = -1;
-    run = 0; # 1-based numbering
-    group = 0
-    block = 0
-    trial = 0
-    isParams = False;
-
-    # Read each line
-    for line in allLines:
-        # split into parts
-        data = line.split()
-
-        # Find params
-        if 'START PARAMETERS' in line:
-            isParams = True;
-        elif 'END PARAMETERS' in line:
-            isParams = False;
-
-        # Parse params
-        elif isParams: # parse parameter
-            key = data[2][:-1] # name of parameter
-            if len(data)==4:
-                try:
-                    params[key] = float(data[3]) # if it's a number, convert to a float
-                except ValueError:
-                    params[key] = data[3] # otherwise, record the string
-            elif data[3].startswith("["):
-                params[key] = ast.literal_eval(''.join(data[3:])) # if the parameter is a list, make it a list variable
-            else:
-                params[key] = ' '.join(data[3:])
-
-        # Parse data
-        elif len(data)>2:
-            if data[2]=='Display': # time and stim presented
-                dfDisp.loc[iDisp,'t'] = float(data[0])
-                dfDisp.loc[iDisp,'stim'] = data[3]
-                if len(data)>4: # if a CS level is specified...
-                    trial +=1
-                    dfDisp.loc[iDisp,'CS'] = data[4] # log it
-                    # set VAS stimulus and type
-                    dfVas.loc[iVas,'tImage'] = dfDisp.loc[iDisp,'t']
-                    dfVas.loc[iVas,'imageFile'] = dfDisp.loc[iDisp,'stim']
-                    dfVas.loc[iVas,'CSplusPercent'] = int(dfDisp.loc[iDisp,'CS'][6:])
-                    dfVas.loc[iVas,'type'] = dfBlock.loc[iBlock,'type']
-                iDisp +=1;
-            elif data[2]=='=====' and data[3]=='START' and data[4]=='RUN':
-                run +=1
-            elif data[2]=='====' and data[3]=='START' and data[4]=='GROUP':
-                group = int(data[5][0])
-            elif data[2]=='===' and data[3]=='START' and data[4]=='BLOCK': # block start time
-                block = int(data[5][0])
-                trial = 0
-                iBlock +=1;
-                dfBlock.loc[iBlock,'tStart'] = float(data[0])
-                dfBlock.loc[iBlock,'run'] = run
-            elif data[2]=='===' and data[3]=='END' and data[4]=='BLOCK': # block end time
-                dfBlock.loc[iBlock,'tEnd'] = float(data[0])
-            elif data[2]=='bottomMsg:':
-                if 'AFRAID' in line:
-                    dfBlock.loc[iBlock,'type'] = 'afraid'
-                elif 'SCREAM' in line:
-                    dfBlock.loc[iBlock,'type'] = 'scream'
-            elif data[2]=='RatingScale': # VAS time, rating, RT
-                if "rating=" in line:
-                    dfVas.loc[iVas,'tStart'] = dfDisp.loc[iDisp-1,'t']
-                    dfVas.loc[iVas,'tEnd'] = float(data[0])
-                    dfVas.loc[iVas,'name'] = data[3][:-1]
-                    value = float(data[-1].split("=")[-1])
-                    dfVas.loc[iVas,'rating'] = value
-                    # if it's an image vas, set indices
-                    if dfVas.loc[iVas,'type'] in ['afraid','scream']:
-                        dfVas.loc[iVas,'run'] = run
-                        dfVas.loc[iVas,'group'] = group
-                        dfVas.loc[iVas,'block'] = block
-                        dfVas.loc[iVas,'trial'] = trial
-                    # if the response timed out, advance without RT/history
-                    if "timed out" in line:
-                        dfVas.loc[iVas,'RT'] = np.nan;
-                        # NOTE: nan indicates unknown, not lack of keypress! 
-                        dfVas.loc[iVas,'timeToFirstPress'] = np.nan;
-                        if dfVas.loc[iVas,'type'] in ['afraid','scream']:
-                            print('WARNING: image rating scale at t=%g (run %d group %d block %d trial %d) timed out! RT and timeToFirstPress will be set to NaN.'%(dfVas.loc[iVas,'tStart'],run,group,block,trial))
-                        else:
-                            print('WARNING: mood rating scale at t=%g timed out! RT and timeToFirstPress will be set to NaN.'%(dfVas.loc[iVas,'tStart']))
-                        # increment VAS index
-                        iVas +=1;
-                elif "RT=" in line:
-                    value = float(data[-1].split("=")[-1])
-                    dfVas.loc[iVas,'RT'] = value
-                elif "history=" in line:
-                    # get time to first button presss
-                    if len(re.split('\), |, |\)]',line))>3:
-                        timeToPress = float(re.split('\), |, |\)]',line)[3])
-                    else:
-                        timeToPress = dfVas.loc[iVas,'RT'] # if no press, default to RT
-                    dfVas.loc[iVas,'timeToFirstPress'] = timeToPress
-                    # increment VAS index
-                    iVas +=1;
+# Get the typed VAS result file written alongside a log (None if there isn't one, e.g. older logs)
+def FindVasResultFile(logFile):
+    vasFile = VasResults.GetVasResultFile(logFile)
+    if os.path.exists(vasFile):
+        return vasFile
+    else:
+        return None
 
 
-    print('Done! Took %.1f seconds.'%(time.time()-t))
+# Import full log (including keypresses)
+def ImportExtinctionRecallTaskLog(logFile):
 
-    print('Extracting VAS data...')
-    t = time.time()
-    # Parse out mood and sound VAS results
-    dfMoodVas = dfVas.loc[pd.isnull(dfVas['imageFile']),:]
-    dfMoodVas = dfMoodVas.drop(['imageFile','CSplusPercent','run','group','block','trial','tImage'],1)
-    # split into mood & sound
-    dfSoundVas = dfMoodVas.loc[dfMoodVas.name.str.startswith('SoundCheck'),:]
-    dfMoodVas = dfMoodVas.loc[~dfMoodVas.name.str.startswith('SoundCheck'),:]
-    # reset indices
-    dfSoundVas = dfSoundVas.reset_index(drop=True)
-    dfMoodVas = dfMoodVas.reset_index(drop=True)
+    params, dfVas, dfKey, dfDisp, dfSync, dfBlock = ParseErLog(logFile,includeKeys=True,vasFile=FindVasResultFile(logFile))
+    dfMoodVas, dfSoundVas, dfImageVas = SplitVasTable(params,dfVas,logFile)
 
-    # Parse out image VAS results
-    dfImageVas = dfVas.loc[pd.notnull(dfVas['imageFile']),:]
-    dfImageVas = dfImageVas.drop('name',1)
+    # Return results
+    return params, dfMoodVas, dfSoundVas, dfImageVas, dfKey, dfDisp, dfSync, dfBlock
 
-    # add Mood VAS types
-    isTraining = 'Training' in logFile
-    dfMoodVas = GetVasTypes(params,dfMoodVas,isTraining)
 
-    # add Sound VAS types (assuming only one question per sound!!!)
-    dfSoundVas['group']=np.arange(dfSoundVas.shape[0])
-    dfSoundVas['groupName']=[x.split('-')[0] for x in dfSoundVas.name]
-    dfSoundVas['type']='loud'
+# Import VAS parts of log (excluding keypresses)
+def ImportExtinctionRecallTaskLog_VasOnly(logFile):
 
-    print('Done! Took %.1f seconds.'%(time.time()-t))
+    params, dfVas, dfKey, dfDisp, dfSync, dfBlock = ParseErLog(logFile,includeKeys=False,vasFile=FindVasResultFile(logFile))
+    dfMoodVas, dfSoundVas, dfImageVas = SplitVasTable(params,dfVas,logFile)
 
     # Return results
     return params, dfMoodVas, dfSoundVas, dfImageVas
@@ -363,12 +305,8 @@ def GetVasTypes(params,dfMoodVas,isTraining=False):
         try:
             vasFile = params['moodQuestionFile%d'%(i+1)]
             print('reading %s...'%vasFile)
-            # read file to get list of questions
-            with open(vasFile,"r") as fi:
-                questions = []
-                for ln in fi:
-                    if ln.startswith("?"):
-                        questions.append(ln[1:])
+            # get list of questions (from the file's compiled cache if it's up to date)
+            questions = QuestionBank.ParseQuestionFile(vasFile)[0]
 
             for j,question in enumerate(questions):
                 isThis = dfMoodVas.name=='%s-%d'%(groupName,j)
@@ -382,19 +320,64 @@ def GetVasTypes(params,dfMoodVas,isTraining=False):
 
     return dfMoodVas # return modified dataframe
 
-# Save figures of the image and mood VAS responses and RTs.
+# Get a figure for drawing offscreen. matplotlib is only imported the first time a figure is needed,
+# and each named figure is cleared and reused (e.g. for every subject) rather than made again.
+vasFigures = {}
+def GetVasFigure(figName):
+
+    if figName not in vasFigures:
+        # use the Agg canvas directly, so no GUI backend (or pyplot) is needed
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure(figsize=(8, 4), dpi=120, facecolor='w', edgecolor='k')
+        FigureCanvasAgg(fig)
+        vasFigures[figName] = fig
+    else:
+        vasFigures[figName].clf()
+    return vasFigures[figName]
+
+
+# Get the filenames of the figures SaveVasFigures will write.
+def GetVasFigureFiles(params,outPrefix='ER3_'):
+
+    figTypes = ['Mood','Image'] if ('Training' in outPrefix) else ['Mood','Sound','Image']
+    return ['%s%d-%d_%sVasFigure.png'%(outPrefix,params['subject'],params['session'],figType) for figType in figTypes]
+
+
+# Plot ratings (left) and RTs (right) of each VAS type in a figure.
+def PlotVasRatingsAndRts(fig,dfVas,vasTypes,xCol,marker,xLabel,title,xTickLabels=None):
+
+    for iPlot,yCol in enumerate(['rating','RT']):
+        ax = fig.add_subplot(1,2,iPlot+1)
+        for vasType in vasTypes:
+            isInType = dfVas.type==vasType
+            ax.plot(dfVas.loc[isInType,xCol],dfVas.loc[isInType,yCol],marker,label=vasType)
+        ax.legend()
+        if xTickLabels is not None:
+            ax.set_xticks(range(len(xTickLabels)))
+            ax.set_xticklabels(xTickLabels)
+        if yCol=='rating':
+            ax.set_ylim([0,100])
+        ax.tick_params(axis='x',labelrotation=15)
+        ax.set_xlabel(xLabel)
+        if yCol=='rating':
+            ax.set_ylabel('rating (0-100)')
+            ax.set_title('%s Ratings'%title)
+        else:
+            ax.set_ylabel('reaction time (s))')
+            ax.set_title('%s RTs'%title)
+
+
+# Save figures of the image and mood VAS responses and RTs. Returns a list of the files written.
 def SaveVasFigures(params,dfMoodVas,dfSoundVas,dfImageVas,outPrefix='ER3_'):
 
     # Set up
     outBase = os.path.basename(outPrefix) # filename without the folder
+    outFiles = GetVasFigureFiles(params,outPrefix)
     print('Plotting VAS data...')
     t = time.time()
 
     # === MOOD VAS === #
-    # Set up figure
-    moodFig = plt.figure(figsize=(8, 4), dpi=120, facecolor='w', edgecolor='k')
-    # Plot Ratings
-    plt.subplot(121)
     # declare constants
     if 'Training' in outPrefix:
         vasGroups=['PreRun1']
@@ -402,111 +385,67 @@ def SaveVasFigures(params,dfMoodVas,dfSoundVas,dfImageVas,outPrefix='ER3_'):
         vasGroups = ['PreSoundCheck','PostRun1','PostRun2','PostRun3']
     vasTypes = ['anxious','tired','worried','mood','doing','feared']
 #    vasTypes = dfMoodVas.type.unique()
-
-    for vasType in vasTypes:
-        isInType = dfMoodVas.type==vasType
-        plt.plot(dfMoodVas.loc[isInType,'group'],dfMoodVas.loc[isInType,'rating'],'.-',label=vasType)
-    plt.legend()
-    plt.xticks(range(len(vasGroups)),vasGroups)
-    plt.ylim([0,100])
-    plt.xticks(rotation=15)
-    plt.xlabel('group')
-    plt.ylabel('rating (0-100)')
-    plt.title('%s%d-%d\n Mood VAS Ratings'%(outBase,params['subject'],params['session']))
-
-    # Plot Reaction Times
-    plt.subplot(122)
-    for vasType in vasTypes:
-        isInType = dfMoodVas.type==vasType
-        plt.plot(dfMoodVas.loc[isInType,'group'],dfMoodVas.loc[isInType,'RT'],'.-',label=vasType)
-    plt.legend()
-    plt.xticks(range(len(vasGroups)),vasGroups)
-    plt.xticks(rotation=15)
-    plt.xlabel('group')
-    plt.ylabel('reaction time (s))')
-    plt.title('%s%d-%d\n Mood VAS RTs'%(outBase,params['subject'],params['session']))
+    moodFig = GetVasFigure('Mood')
+    PlotVasRatingsAndRts(moodFig,dfMoodVas,vasTypes,'group','.-','group',
+        '%s%d-%d\n Mood VAS'%(outBase,params['subject'],params['session']),vasGroups)
 
     # Save figure
-    outFile = '%s%d-%d_MoodVasFigure.png'%(outPrefix,params['subject'],params['session'])
+    outFile = outFiles[0]
     print("Saving Mood VAS figure as %s..."%outFile)
     moodFig.savefig(outFile)
 
-
-
     # === SOUND CHECK VAS === #
     # No sound checks in training task
     if not 'Training' in outPrefix:
         # declare constants
         vasGroups = ['SoundCheck1','SoundCheck2','SoundCheck3']
         vasTypes = ['loud']
-
-        # Set up figure
-        soundFig = plt.figure(figsize=(8, 4), dpi=120, facecolor='w', edgecolor='k')
-        # Plot Ratings
-        plt.subplot(121)
-
-        for vasType in vasTypes:
-            isInType = dfSoundVas.type==vasType
-            plt.plot(dfSoundVas.loc[isInType,'group'],dfSoundVas.loc[isInType,'rating'],'.-',label=vasType)
-        plt.legend()
-        plt.xticks(range(len(vasGroups)),vasGroups)
-        plt.ylim([0,100])
-        plt.xticks(rotation=15)
-        plt.xlabel('group')
-        plt.ylabel('rating (0-100)')
-        plt.title('%s subject %d session %d\n Sound VAS Ratings'%(outBase,params['subject'],params['session']))
-
-        # Plot Reaction Times
-        plt.subplot(122)
-        for vasType in vasTypes:
-            isInType = dfSoundVas.type==vasType
-            plt.plot(dfSoundVas.loc[isInType,'group'],dfSoundVas.loc[isInType,'RT'],'.-',label=vasType)
-        plt.legend()
-        plt.xticks(range(len(vasGroups)),vasGroups)
-        plt.xticks(rotation=15)
-        plt.xlabel('group')
-        plt.ylabel('reaction time (s))')
-        plt.title('%s subject %d session %d\n Sound VAS RTs'%(outBase,params['subject'],params['session']))
+        soundFig = GetVasFigure('Sound')
+        PlotVasRatingsAndRts(soundFig,dfSoundVas,vasTypes,'group','.-','group',
+            '%s subject %d session %d\n Sound VAS'%(outBase,params['subject'],params['session']),vasGroups)
 
         # Save figure
-        outFile = '%s%d-%d_SoundVasFigure.png'%(outPrefix,params['subject'],params['session'])
+        outFile = outFiles[1]
         print("Saving Sound VAS figure as %s..."%outFile)
         soundFig.savefig(outFile)
 
     # === IMAGE VAS === #
     # Plot image VAS results
-    imgFig = plt.figure(figsize=(8, 4), dpi=120, facecolor='w', edgecolor='k')
-
-    # Plot Ratings
-    plt.subplot(121)
     vasTypes = dfImageVas.type.unique()
-    for vasType in vasTypes:
-        isInType = dfImageVas.type==vasType
-        plt.plot(dfImageVas.loc[isInType,'CSplusPercent'],dfImageVas.loc[isInType,'rating'],'.',label=vasType)
-    plt.legend()
-    plt.ylim([0,100])
-    plt.xticks(rotation=15)
-    plt.xlabel('CS plus level (%)')
-    plt.ylabel('rating (0-100)')
-    plt.title('%s%d-%d\n Image VAS Ratings'%(outBase,params['subject'],params['session']))
-
-    # Plot Reaction Times
-    plt.subplot(122)
-    for vasType in vasTypes:
-        isInType = dfImageVas.type==vasType
-        plt.plot(dfImageVas.loc[isInType,'CSplusPercent'],dfImageVas.loc[isInType,'RT'],'.',label=vasType)
-    plt.legend()
-    plt.xticks(rotation=15)
-    plt.xlabel('CS plus level (%)')
-    plt.ylabel('reaction time (s))')
-    plt.title('%s%d-%d\n Image VAS RTs'%(outBase,params['subject'],params['session']))
+    imgFig = GetVasFigure('Image')
+    PlotVasRatingsAndRts(imgFig,dfImageVas,vasTypes,'CSplusPercent','.','CS plus level (%)',
+        '%s%d-%d\n Image VAS'%(outBase,params['subject'],params['session']))
 
     # Save figure
-    outFile = '%s%d-%d_ImageVasFigure.png'%(outPrefix,params['subject'],params['session'])
+    outFile = outFiles[-1]
     print("Saving Image VAS figure as %s..."%outFile)
     imgFig.savefig(outFile)
 
     print('Done! Took %.1f seconds.'%(time.time()-t))
+    return outFiles
+
+
+# Save VAS figures in a pool of background processes while the calling process goes on to the next log.
+class VasFigureRenderer:
+
+    def __init__(self,nJobs=1):
+        self.pool = multiprocessing.Pool(nJobs)
+        self.results = []
+
+    # Queue a call to SaveVasFigures. Returns the files that will be written.
+    def SaveVasFigures(self,params,dfMoodVas,dfSoundVas,dfImageVas,outPrefix='ER3_'):
+        self.results.append(self.pool.apply_async(SaveVasFigures,(params,dfMoodVas,dfSoundVas,dfImageVas,outPrefix)))
+        return GetVasFigureFiles(params,outPrefix)
+
+    # Wait for all queued figures to be saved.
+    def Close(self):
+        self.pool.close()
+        for result in self.results:
+            try:
+                result.get()
+            except Exception as err:
+                print('ERROR saving VAS figures: %s'%err)
+        self.pool.join()
 
 
 # Convert mood VAS to a single line for logging to multi-subject spreadsheet
@@ -554,7 +493,10 @@ def GetSingleVasLine(params,dfVas,isTraining=False,isSoundVas=False):
     return dfVas_singleRow
 
 
-# Write events to BIDS-formatted events files
+# Write events to BIDS-formatted events files. Returns a list of the files written.
+# Each event is assigned to its run's scan window with one np.searchsorted call, and the identifier &
+# trial_type strings are built for all runs at once, so the time taken grows with the number of events
+# (not runs x events). Assumes runs' scan windows don't overlap, as they can't in the task.
 def WriteBidsEventsFiles(dfDisp,dfKey,dfImageVas,dfBlock,subject,outFolder='./',isTraining=False):
 
     # make sure times are floats, not strings
@@ -566,65 +508,101 @@ def WriteBidsEventsFiles(dfDisp,dfKey,dfImageVas,dfBlock,subject,outFolder='./',
 
     # Get stim durations
     tDisp = dfDisp.t.values;
-    dfDisp['duration'] = 0;
-    dfDisp.duration.iloc[:-1] = tDisp[1:] - tDisp[:-1]
+    duration = np.zeros(len(tDisp))
+    duration[:-1] = tDisp[1:] - tDisp[:-1]
+    dfDisp['duration'] = duration
 
     # find times of scan starts
     tWaitForStarts = dfDisp.loc[dfDisp.stim=='WaitingForScanner','t'].values
-    print('Writing BIDS event files for %d runs...'%len(tWaitForStarts))
+    nRuns = len(tWaitForStarts)
+    print('Writing BIDS event files for %d runs...'%nRuns)
+    outFiles = []
+    if nRuns==0:
+        return outFiles
 
     # create output directory
     fileOutDir = os.path.join(outFolder,'sub-%05d'%subject,'func')
     if not os.path.exists(fileOutDir):
-        os.makedirs(fileOutDir)
-
-    for iRun,tWait in enumerate(tWaitForStarts):
-        # get scan start and end time based on display
-        tStartScan = dfKey.loc[(dfKey.key=='5') & (dfKey.t>tWait),'t'].values[0]
-        tEndScan = dfBlock.loc[(dfBlock.run)==iRun+1,'tEnd'].values[-1]
-
-        # get events & info specifically in this scan
-        isInScan = (dfKey.t>tStartScan) & (dfKey.t<tEndScan)
-        dfKey_scan = dfKey[isInScan]
-        isInScan = (dfDisp.t>tStartScan) & (dfDisp.t<tEndScan)
-        dfDisp_scan = dfDisp[isInScan]
-        isInScan = (dfImageVas.tStart>tStartScan) & (dfImageVas.tStart<tEndScan)
-        dfImageVas_scan = dfImageVas[isInScan]
-        CSnum = dfImageVas_scan.CSplusPercent.values
-        blockType = dfImageVas_scan.type.values
-
-        # make dataframe for keypress events
-        dfEvents1 = pd.DataFrame(columns=colNames);
-        dfEvents1['onset'] = dfKey_scan.t-tStartScan
-        dfEvents1['identifier'] = ['key-down_%s'%x for x in dfKey_scan.key]
-        dfEvents1['duration'] = 0;
-        #dfEvents.loc[isImage,'trial_type'] = ['%s_CS%s'%(blockType[i],CSnum[i]) for i in range(len(CSnum))]
-
-        # make dataframe for display events
-        dfEvents2 = pd.DataFrame(columns=colNames);
-        dfEvents2['onset'] = dfDisp_scan.t-tStartScan
-        dfEvents2['duration'] = dfDisp_scan['duration']
-        dfEvents2['identifier'] = ['disp_%s'%x for x in dfDisp_scan.stim]
-        isImage = pd.notna(dfDisp_scan.CS)
-        isImageRating = dfDisp_scan.stim=='ImageRating0';
-        dfEvents2.loc[isImage,'trial_type'] = ['%s_CS-%s'%(blockType[i],CSnum[i]) for i in range(len(CSnum))]
-        dfEvents2.loc[isImageRating,'trial_type'] = ['%s_CS-%s'%(blockType[i],CSnum[i]) for i in range(len(CSnum))]
-        dfEvents2.loc[isImage,'stim_file'] = dfDisp_scan.loc[isImage,'stim']
-        dfEvents2.loc[isImageRating,'stim_file'] = dfDisp_scan.loc[isImage,'stim'].values
-        dfEvents2.loc[isImage,'identifier'] = 'disp_Face'
-        dfEvents2.loc[isImageRating,'identifier'] = 'disp_ImageRating'
-        dfEvents2.loc[isImageRating,'response'] = dfImageVas_scan.rating.values # rating final value
-        # dfEvents2.loc[isImageRating,'response_time'] = dfImageVas_scan.RT.values # rating final value
-
-        # combine dataframes
-        dfEvents = pd.concat((dfEvents1,dfEvents2))
-        # convert numbers to floats
-        dfEvents['onset'] = dfEvents['onset'].astype(float)
-        dfEvents['duration'] = dfEvents['duration'].astype(float)
-        dfEvents['response'] = dfEvents['response'].astype(float)
+        try:
+            os.makedirs(fileOutDir)
+        except OSError: # another worker may have just made it
+            pass
+
+    # get scan start (first trigger after each wait) and end (end of run's last block) times
+    tTriggers = np.sort(dfKey.loc[dfKey.key=='5','t'].values)
+    tStartScans = tTriggers[np.searchsorted(tTriggers,tWaitForStarts,side='right')]
+    dfLastBlocks = dfBlock.drop_duplicates('run',keep='last').set_index('run')
+    tEndScans = dfLastBlocks.loc[np.arange(nRuns)+1,'tEnd'].values.astype(float)
+
+    # get the (0-based) run whose scan each time falls in (tStartScan<t<tEndScan), or -1 for none
+    def GetRunIndex(t):
+        iRun = np.searchsorted(tStartScans,t,side='left')-1
+        isInScan = (iRun>=0) & (t<tEndScans[iRun])
+        return np.where(isInScan,iRun,-1)
+
+    # make dataframe for keypress events
+    iRunKey = GetRunIndex(dfKey.t.values)
+    isInScan = iRunKey>=0
+    dfEvents1 = pd.DataFrame(columns=colNames);
+    dfEvents1['onset'] = dfKey.t.values[isInScan] - tStartScans[iRunKey[isInScan]]
+    dfEvents1['identifier'] = ('key-down_' + dfKey.key.astype(str)).values[isInScan]
+    dfEvents1['duration'] = 0;
+    dfEvents1['run'] = iRunKey[isInScan]
+
+    # get image VAS info in each scan (in the order they appear)
+    iRunVas = GetRunIndex(dfImageVas.tStart.values.astype(float))
+    isInScan = iRunVas>=0
+    vasTrialTypes = (dfImageVas.type.astype(str) + '_CS-' + dfImageVas.CSplusPercent.astype(str)).values[isInScan]
+    vasRatings = dfImageVas.rating.values[isInScan]
+    iRunVas = iRunVas[isInScan]
+
+    # make dataframe for display events
+    iRunDisp = GetRunIndex(tDisp)
+    isInScan = iRunDisp>=0
+    dfDisp_scan = dfDisp[isInScan]
+    iRunDisp = iRunDisp[isInScan]
+    stims = dfDisp_scan.stim.values
+    isImage = pd.notna(dfDisp_scan.CS).values
+    isImageRating = (dfDisp_scan.stim=='ImageRating0').values;
+    # the nth image (and nth image rating) of each run goes with the nth image VAS of that run
+    nImages = np.bincount(iRunDisp[isImage],minlength=nRuns)
+    nVas = np.bincount(iRunVas,minlength=nRuns)
+    if np.any(nImages!=nVas) or np.any(np.bincount(iRunDisp[isImageRating],minlength=nRuns)!=nVas):
+        raise ValueError('Numbers of images, image ratings and image VAS results per run don\'t match.')
+    identifiers = ('disp_' + dfDisp_scan.stim.astype(str)).values
+    identifiers[isImage] = 'disp_Face'
+    identifiers[isImageRating] = 'disp_ImageRating'
+    trialTypes = np.full(len(stims),np.nan,dtype=object)
+    trialTypes[isImage] = vasTrialTypes
+    trialTypes[isImageRating] = vasTrialTypes
+    stimFiles = np.full(len(stims),np.nan,dtype=object)
+    stimFiles[isImage] = stims[isImage]
+    stimFiles[isImageRating] = stims[isImage]
+    responses = np.full(len(stims),np.nan,dtype=object)
+    responses[isImageRating] = vasRatings # rating final value
+    dfEvents2 = pd.DataFrame(columns=colNames);
+    dfEvents2['onset'] = dfDisp_scan.t.values - tStartScans[iRunDisp]
+    dfEvents2['duration'] = dfDisp_scan['duration'].values
+    dfEvents2['identifier'] = identifiers
+    dfEvents2['trial_type'] = trialTypes
+    dfEvents2['stim_file'] = stimFiles
+    dfEvents2['response'] = responses
+    dfEvents2['run'] = iRunDisp
+
+    # combine dataframes
+    dfEvents = pd.concat((dfEvents1,dfEvents2),ignore_index=True)
+    # convert numbers to floats
+    dfEvents['onset'] = dfEvents['onset'].astype(float)
+    dfEvents['duration'] = dfEvents['duration'].astype(float)
+    dfEvents['response'] = dfEvents['response'].astype(float)
+    runRows = dfEvents.groupby('run').indices
+    dfEvents = dfEvents[colNames]
+
+    # Write each run's events
+    for iRun in range(nRuns):
         # sort events chronologically
-        dfEvents = dfEvents.sort_values('onset')
-        dfEvents = dfEvents.reset_index(drop=True)
+        dfEvents_run = dfEvents.iloc[runRows.get(iRun,[])].sort_values('onset')
+        dfEvents_run = dfEvents_run.reset_index(drop=True)
 
         # write to file
         if isTraining:
@@ -632,11 +610,19 @@ def WriteBidsEventsFiles(dfDisp,dfKey,dfImageVas,dfBlock,subject,outFolder='./',
         else:
             fileOut = os.path.join(fileOutDir,'sub-%05d_task-ER3_run-%d_events.tsv'%(subject,iRun+1))
         print('Writing BIDS-formatted events to %s...'%fileOut)
-        dfEvents.to_csv(fileOut,index=False,sep='\t',float_format='%.3f',na_rep='n/a')
+        dfEvents_run.to_csv(fileOut,index=False,sep='\t',float_format='%.3f',na_rep='n/a')
+        outFiles.append(fileOut)
         print('Done!')
 
+    return outFiles
+
 # Do everything: import the log, produce the figures, and produce the tables.
-def ProcessERLog(logFilename,outFolder,makeBids=False):
+# If appendTables is False, the single-row cross-subject table entries are returned instead of written
+# (so parallel workers can hand them back to one writer). Returns a dict of {tableName: dfSingleRow}
+# and a list of the per-subject files written.
+# If makeFigures is False, the VAS figures are skipped. If figureRenderer (a VasFigureRenderer) is given,
+# they're saved in the background.
+def ProcessERLog(logFilename,outFolder,makeBids=False,appendTables=True,makeFigures=True,figureRenderer=None):
 
     # Get experiment type
     isTraining = ('Training' in logFilename) # is it a training run?
@@ -644,52 +630,41 @@ def ProcessERLog(logFilename,outFolder,makeBids=False):
     # import data
     if makeBids:
         readParams,dfMoodVas,dfSoundVas,dfImageVas,dfKey,dfDisp,dfSync,dfBlock = ImportExtinctionRecallTaskLog(logFilename)
-        WriteBidsEventsFiles(dfDisp,dfKey,dfImageVas,dfBlock,readParams['subject'],outFolder,isTraining)
+        outFiles = WriteBidsEventsFiles(dfDisp,dfKey,dfImageVas,dfBlock,readParams['subject'],outFolder,isTraining)
     else:
+        outFiles = []
         readParams,dfMoodVas,dfSoundVas,dfImageVas = ImportExtinctionRecallTaskLog_VasOnly(logFilename)
 
     # create output folder if it doesn't exist
     subjOutFolder = os.path.join(outFolder,'%d'%(readParams['subject']))
     if not os.path.exists(subjOutFolder):
-        os.makedirs(subjOutFolder)
+        try:
+            os.makedirs(subjOutFolder)
+        except OSError: # another worker may have just made it
+            pass
 
-    # declare cross-subject table filenames
+    # declare cross-subject table names (in the VAS store, and the basename of their Excel exports)
     if isTraining: # if it's a training run
-        outMoodTable = os.path.join(outFolder,'ER3Training-MoodVasTable.xlsx')
+        outMoodTable = 'ER3Training-MoodVasTable'
         subjOutPrefix = os.path.join(subjOutFolder,'ER3Training_')
     else:
-        outMoodTable = os.path.join(outFolder,'ER3-MoodVasTable.xlsx')
-        outSoundTable = os.path.join(outFolder,'ER3-SoundVasTable.xlsx')
+        outMoodTable = 'ER3-MoodVasTable'
+        outSoundTable = 'ER3-SoundVasTable'
         subjOutPrefix = os.path.join(subjOutFolder,'ER3_')
 
     # make figures
-    SaveVasFigures(readParams,dfMoodVas,dfSoundVas,dfImageVas,subjOutPrefix)
-
-    # convert mood VAS to single line
-    dfMoodVas_singleRow = GetSingleVasLine(readParams,dfMoodVas,isTraining)
-    # Append output table to file
-    print("Appending to Mood VAS table %s..."%os.path.basename(outMoodTable))
-    if os.path.exists(outMoodTable):
-        dfMoodVas_all = pd.read_excel(outMoodTable,index_col=None)
-        dfMoodVas_all = dfMoodVas_all.append(dfMoodVas_singleRow)
-        dfMoodVas_all = dfMoodVas_all.drop_duplicates()
-        dfMoodVas_all.to_excel(outMoodTable,index=False)
-    else:
-        dfMoodVas_singleRow.to_excel(outMoodTable,index=False)
+    if makeFigures and figureRenderer is not None:
+        outFiles = outFiles + figureRenderer.SaveVasFigures(readParams,dfMoodVas,dfSoundVas,dfImageVas,subjOutPrefix)
+    elif makeFigures:
+        outFiles = outFiles + SaveVasFigures(readParams,dfMoodVas,dfSoundVas,dfImageVas,subjOutPrefix)
 
+    # convert mood (and sound) VAS to single lines for the cross-subject tables
+    newRows = {outMoodTable: GetSingleVasLine(readParams,dfMoodVas,isTraining)}
     if not isTraining: # if it's not a training run
-        # convert sound VAS to single line
-        dfSoundVas_singleRow = GetSingleVasLine(readParams,dfSoundVas,isTraining,isSoundVas=True)
-        # Append output table to file
-        print("Appending to Sound VAS table %s..."%os.path.basename(outSoundTable))
-        if os.path.exists(outSoundTable):
-            dfSoundVas_all = pd.read_excel(outSoundTable,index_col=None)
-            dfSoundVas_all = dfSoundVas_all.append(dfSoundVas_singleRow)
-            dfSoundVas_all = dfSoundVas_all.drop_duplicates()
-            dfSoundVas_all.to_excel(outSoundTable,index=False)
-        else:
-            dfSoundVas_singleRow.to_excel(outSoundTable,index=False)
-
+        newRows[outSoundTable] = GetSingleVasLine(readParams,dfSoundVas,isTraining,isSoundVas=True)
+    # Add rows to the cross-subject VAS store
+    if appendTables:
+        AppendToVasStore(outFolder,newRows)
 
     # Save Image VAS table (one per run)
     runs = dfImageVas.run.unique()
@@ -698,8 +673,272 @@ def ProcessERLog(logFilename,outFolder,makeBids=False):
         outImageTable = '%s%d-%d_run%d-ImageVasTable.xlsx'%(subjOutPrefix,readParams['subject'],readParams['session'],run)
         print("Saving Image VAS table %s..."%os.path.basename(outImageTable))
         dfImageVas_thisrun.to_excel(outImageTable,index=False)
+        outFiles.append(outImageTable)
 
     print('Done!')
+    return newRows, outFiles
+
+
+# Get the filename of the SQLite store holding the cross-subject VAS tables.
+def GetVasStoreFile(outFolder):
+    return os.path.join(outFolder,'ER3-VasTables.sqlite')
+
+
+# Convert a table cell to a value sqlite can store (NaN -> NULL, numpy scalars -> python).
+def ToSqlValue(value):
+    if value is None or (isinstance(value,float) and np.isnan(value)):
+        return None
+    elif hasattr(value,'item'):
+        return ToSqlValue(value.item())
+    else:
+        return value
+
+
+# Add single-row VAS results (from GetSingleVasLine) to the cross-subject VAS store.
+# newRows is a dict of {tableName: dfSingleRow} or {tableName: [dfSingleRow,...]}.
+# Each table is keyed on (subject, session), so reprocessing a log replaces its row rather than
+# adding a duplicate, and adding a row costs the same however many subjects are already in the study.
+# The first time a table is created, rows from an existing Excel table of the same name are imported.
+def AppendToVasStore(outFolder,newRows):
+
+    con = sqlite3.connect(GetVasStoreFile(outFolder),timeout=60)
+    try:
+        with con: # one transaction for all tables
+            for tableName in sorted(newRows.keys()):
+                dfNew = newRows[tableName]
+                if isinstance(dfNew,list):
+                    dfNew = pd.concat(dfNew)
+                print("Adding %d row(s) to VAS table %s..."%(dfNew.shape[0],tableName))
+                # create the table the first time, seeding it from the old Excel table if there is one
+                isNew = con.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?",(tableName,)).fetchone() is None
+                if isNew:
+                    con.execute('CREATE TABLE "%s" (subject INTEGER, session INTEGER, date TEXT, PRIMARY KEY (subject, session))'%tableName)
+                    oldTable = os.path.join(outFolder,'%s.xlsx'%tableName)
+                    if os.path.exists(oldTable):
+                        print("Importing existing VAS table %s..."%os.path.basename(oldTable))
+                        dfNew = pd.concat((pd.read_excel(oldTable,index_col=None),dfNew))
+                # add any columns the table doesn't have yet
+                oldCols = [row[1] for row in con.execute('PRAGMA table_info("%s")'%tableName)]
+                for col in dfNew.columns:
+                    if col not in oldCols:
+                        con.execute('ALTER TABLE "%s" ADD COLUMN "%s" REAL'%(tableName,col))
+                # insert rows, replacing any old row for the same subject & session
+                cols = list(dfNew.columns)
+                sql = 'INSERT OR REPLACE INTO "%s" (%s) VALUES (%s)'%(tableName,','.join(['"%s"'%col for col in cols]),','.join(['?']*len(cols)))
+                con.executemany(sql,[[ToSqlValue(value) for value in row] for row in dfNew.itertuples(index=False)])
+    finally:
+        con.close()
+
+
+# Export each table in the cross-subject VAS store to an Excel file (<tableName>.xlsx) in outFolder.
+def ExportVasTables(outFolder):
+
+    storeFile = GetVasStoreFile(outFolder)
+    if not os.path.exists(storeFile):
+        print('No VAS store found at %s.'%storeFile)
+        return []
+    con = sqlite3.connect(storeFile,timeout=60)
+    try:
+        tableNames = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        outFiles = []
+        for tableName in tableNames:
+            dfVas_all = pd.read_sql_query('SELECT * FROM "%s" ORDER BY subject, session'%tableName,con)
+            outTable = os.path.join(outFolder,'%s.xlsx'%tableName)
+            print("Exporting %d rows of VAS table %s to %s..."%(dfVas_all.shape[0],tableName,os.path.basename(outTable)))
+            dfVas_all.to_excel(outTable,index=False)
+            outFiles.append(outTable)
+    finally:
+        con.close()
+    return outFiles
+
+
+# Get the (tableName, subject, session) keys of the rows in the cross-subject VAS store (empty if there's no store).
+def GetVasStoreKeys(outFolder):
+
+    storeFile = GetVasStoreFile(outFolder)
+    keys = set()
+    if not os.path.exists(storeFile):
+        return keys
+    con = sqlite3.connect(storeFile,timeout=60)
+    try:
+        tableNames = [row[0] for row in con.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for tableName in tableNames:
+            keys.update([(tableName,subject,session) for subject,session in con.execute('SELECT subject, session FROM "%s"'%tableName)])
+    finally:
+        con.close()
+    return keys
+
+
+# Get the (tableName, subject, session) keys of single-row VAS results (from ProcessERLog), as lists for the manifest.
+def GetVasRowKeys(newRows):
+
+    return [[tableName,int(subject),int(session)] for tableName in sorted(newRows.keys())
+            for subject,session in zip(newRows[tableName]['subject'],newRows[tableName]['session'])]
+
+
+# Get the SHA-1 hash of a file's contents, reading it in chunks.
+def GetFileHash(filename,chunkSize=2**20):
+
+    fileHash = hashlib.sha1()
+    with open(filename,'rb') as f:
+        chunk = f.read(chunkSize)
+        while chunk:
+            fileHash.update(chunk)
+            chunk = f.read(chunkSize)
+    return fileHash.hexdigest()
+
+
+# Get the size, mtime and hash of a log's VAS result file for the manifest, or None if it doesn't have one.
+def GetVasResultFileInfo(logFile):
+
+    vasFile = FindVasResultFile(logFile)
+    if vasFile is None:
+        return None
+    vasStat = os.stat(vasFile)
+    return {'size': vasStat.st_size, 'mtime': vasStat.st_mtime, 'hash': GetFileHash(vasFile)}
+
+
+# Load the manifest of processed logs ({logBasename: entry}), or an empty one if it doesn't exist yet.
+def LoadManifest(manifestFile):
+
+    if os.path.exists(manifestFile):
+        with open(manifestFile,'r') as f:
+            return json.load(f)
+    else:
+        return {}
+
+
+# Save the manifest of processed logs.
+def SaveManifest(manifest,manifestFile):
+
+    with open(manifestFile,'w') as f:
+        json.dump(manifest,f,indent=1,sort_keys=True)
+
+
+# Check whether a log's manifest entry says its outputs are up to date.
+# Logs are keyed by basename and outputs stored relative to outFolder, so the Mac & PC paths share a manifest.
+# If only the mtime changed (e.g. the file was copied), the hash is checked and the entry updated.
+# storeKeys (from GetVasStoreKeys) are the rows in the VAS store: a log whose rows aren't there (e.g. the store
+# was deleted or rebuilt) is out of date. If it's None, the store is read.
+def IsLogUpToDate(manifest,logFile,outFolder,makeBids=False,makeFigures=True,storeKeys=None):
+
+    entry = manifest.get(os.path.basename(logFile))
+    if entry is None:
+        return False
+    # are all the requested outputs still there?
+    if makeBids and not entry['makeBids']:
+        return False
+    if makeFigures and not entry.get('makeFigures',True):
+        return False
+    for outFile in entry['outputs']:
+        if not os.path.exists(os.path.join(outFolder,outFile)):
+            return False
+    # are its cross-subject rows still in the VAS store?
+    if 'vasRows' not in entry: # from before the store rows were recorded
+        return False
+    if storeKeys is None:
+        storeKeys = GetVasStoreKeys(outFolder)
+    for tableName,subject,session in entry['vasRows']:
+        if (tableName,subject,session) not in storeKeys:
+            return False
+    # has the log changed?
+    logStat = os.stat(logFile)
+    if logStat.st_size!=entry['size']:
+        return False
+    if logStat.st_mtime!=entry['mtime']:
+        if GetFileHash(logFile)!=entry['hash']:
+            return False
+        entry['mtime'] = logStat.st_mtime
+    # has its VAS result file (which ParseErLog reads ratings from) appeared, gone or changed?
+    if 'vasResults' not in entry: # from before VAS result files were recorded
+        return False
+    vasFile = FindVasResultFile(logFile)
+    vasEntry = entry['vasResults']
+    if (vasFile is None)!=(vasEntry is None):
+        return False
+    if vasFile is not None:
+        vasStat = os.stat(vasFile)
+        if vasStat.st_size!=vasEntry['size']:
+            return False
+        if vasStat.st_mtime!=vasEntry['mtime']:
+            if GetFileHash(vasFile)!=vasEntry['hash']:
+                return False
+            vasEntry['mtime'] = vasStat.st_mtime
+    return True
+
+
+# Record a processed log, the outputs produced from it and its rows in the VAS store (newRows) in the manifest.
+def UpdateManifest(manifest,logFile,outFolder,makeBids,makeFigures,outFiles,newRows):
+
+    logStat = os.stat(logFile)
+    manifest[os.path.basename(logFile)] = {
+        'size': logStat.st_size,
+        'mtime': logStat.st_mtime,
+        'hash': GetFileHash(logFile),
+        'vasResults': GetVasResultFileInfo(logFile),
+        'makeBids': makeBids,
+        'makeFigures': makeFigures,
+        'outputs': [os.path.relpath(outFile,outFolder) for outFile in outFiles],
+        'vasRows': GetVasRowKeys(newRows)}
+
+
+# Process a list of logs, in a pool of nJobs worker processes if nJobs>1.
+# In parallel mode the cross-subject VAS rows are written once at the end, from this process only.
+# Unless force is True, logs that the manifest in outFolder lists as up to date are skipped.
+# If figureJobs>0 (and nJobs==1), figures are saved by that many background processes.
+def ProcessERLogs(logFiles,outFolder,makeBids=False,nJobs=1,force=False,makeFigures=True,figureJobs=0):
+
+    # Skip logs that haven't changed since they were last processed
+    if not os.path.exists(outFolder):
+        os.makedirs(outFolder)
+    manifestFile = os.path.join(outFolder,'ER3-ProcessingManifest.json')
+    manifest = LoadManifest(manifestFile)
+    if not force:
+        nLogs = len(logFiles)
+        storeKeys = GetVasStoreKeys(outFolder)
+        logFiles = [logFile for logFile in logFiles if not IsLogUpToDate(manifest,logFile,outFolder,makeBids,makeFigures,storeKeys)]
+        print('Skipping %d up-to-date files.'%(nLogs-len(logFiles)))
+
+    if nJobs<=1:
+        if makeFigures and figureJobs>0 and logFiles:
+            figureRenderer = VasFigureRenderer(figureJobs)
+        else:
+            figureRenderer = None
+        try:
+            for logFile in logFiles:
+                newRows,outFiles = ProcessERLog(logFile,outFolder,makeBids,True,makeFigures,figureRenderer)
+                UpdateManifest(manifest,logFile,outFolder,makeBids,makeFigures,outFiles,newRows)
+                SaveManifest(manifest,manifestFile)
+        finally:
+            if figureRenderer is not None:
+                figureRenderer.Close()
+        SaveManifest(manifest,manifestFile) # in case any mtimes were updated
+        return
+
+    # Process each log in a worker, collecting its table rows
+    print('Processing %d files with %d parallel jobs...'%(len(logFiles),nJobs))
+    pool = multiprocessing.Pool(nJobs)
+    results = [pool.apply_async(ProcessERLog,(logFile,outFolder,makeBids,False,makeFigures)) for logFile in logFiles]
+    pool.close()
+    allNewRows = []
+    processedLogs = []
+    for logFile,result in zip(logFiles,results):
+        try:
+            newRows,outFiles = result.get()
+            allNewRows.append(newRows)
+            processedLogs.append((logFile,outFiles,newRows))
+        except Exception as err: # keep the other subjects' rows
+            print('ERROR processing file %s: %s'%(logFile,err))
+    pool.join()
+
+    # Add the new rows to the cross-subject VAS store
+    outTables = sorted(set([outTable for newRows in allNewRows for outTable in newRows]))
+    AppendToVasStore(outFolder,dict([(outTable,[newRows[outTable] for newRows in allNewRows if outTable in newRows]) for outTable in outTables]))
+
+    # Only mark logs as processed once their rows are in the tables
+    for logFile,outFiles,newRows in processedLogs:
+        UpdateManifest(manifest,logFile,outFolder,makeBids,makeFigures,outFiles,newRows)
+    SaveManifest(manifest,manifestFile)
 
 
 
@@ -709,9 +948,16 @@ def ProcessERLog(logFilename,outFolder,makeBids=False):
 parser = argparse.ArgumentParser(description='Process ExtinctionRecall3 log file, producing figures and tables with relevant info.')
 
 parser.add_argument('--subjects', nargs='*', default='', help='SDAN numbers of subjects to process')
+parser.add_argument('--allSubjects', action='store_true', help='process every ER3 log in the Raw folder')
 #parser.add_argument('--logFiles', nargs='*', default='', help='log filename')
 parser.add_argument('--isMac', action='store_true', help='use mac paths instead of PC')
 parser.add_argument('--makeBids', action='store_true', help='Write BIDS events files (slower)')
+parser.add_argument('--jobs', type=int, default=1, help='number of logs to process in parallel')
+parser.add_argument('--noFigures', '--no-figures', dest='noFigures', action='store_true', help='skip plotting the VAS figures')
+parser.add_argument('--figureJobs', type=int, default=0, help='number of background processes to save figures with (if --jobs is 1)')
+parser.add_argument('--force', action='store_true', help='reprocess logs even if the manifest says they are up to date')
+parser.add_argument('--exportExcel', action='store_true', help='export the cross-subject VAS tables to Excel after processing')
+parser.add_argument('--indexLogs', action='store_true', help='add the logs to the parameter/run index (ER3-LogIndex.sqlite in the data folder)')
 
 
 # ==== Declare main command-line function ==== #
@@ -728,10 +974,21 @@ if __name__ == '__main__':
 
     outFolder = os.path.join(baseDir,'Processed')
 
-    for subj in args.subjects:
-        logFiles = glob(os.path.join(baseDir,'Raw','ER3*_%s-*.log'%subj))
-        print('Found %d files for subject %s.'%(len(logFiles),subj))
-
-        for logFile in logFiles:
-            print('Found file %s...'%logFile)
-            ProcessERLog(logFile,outFolder,args.makeBids)
+    logFiles = []
+    if args.allSubjects:
+        logFiles = sorted(glob(os.path.join(baseDir,'Raw','ER3*_*-*.log')))
+        print('Found %d files in %s.'%(len(logFiles),os.path.join(baseDir,'Raw')))
+    else:
+        for subj in args.subjects:
+            subjLogFiles = glob(os.path.join(baseDir,'Raw','ER3*_%s-*.log'%subj))
+            print('Found %d files for subject %s.'%(len(subjLogFiles),subj))
+
+            for logFile in subjLogFiles:
+                print('Found file %s...'%logFile)
+            logFiles = logFiles + subjLogFiles
+
+    if args.indexLogs:
+        LogIndex.IndexLogs(logFiles,os.path.join(baseDir,'ER3-LogIndex.sqlite'))
+    ProcessERLogs(logFiles,outFolder,args.makeBids,args.jobs,args.force,not args.noFigures,args.figureJobs)
+    if args.exportExcel:
+        ExportVasTables(outFolder)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python2
+"""Measure how many camera-setup frames/s EyeLinkCoreGraphicsPsychoPy can display."""
+# BenchmarkEyeImage.py
+# Created 10/16/26 by DJ.
+#
+# Feeds synthetic eye-camera frames, one line at a time (as the EyeLink host does), to draw_image_line and
+# reports the frames/s displayed. --method png also times the old way (a python loop per pixel, then saving
+# the image as a PNG and reloading it into an ImageStim) for comparison.
+# No tracker or sound files are needed (but pylink must be installed).
+# Usage:
+#   python BenchmarkEyeImage.py --frames 200 --width 192 --height 160
+
+from psychopy import visual, core
+import pylink
+import numpy as np
+import os
+import tempfile # for the old method's PNG
+import argparse # for command-line arguments
+from EyeLinkCoreGraphicsPsychoPy import EyeLinkCoreGraphicsPsychoPy
+
+
+# --- CAMERA-SETUP DISPLAY WITHOUT SOUNDS OR TRACKER SETUP --- #
+class BenchmarkDisplay(EyeLinkCoreGraphicsPsychoPy):
+    def __init__(self, win, bgcolor=(255,255,255)):
+        pylink.EyeLinkCustomDisplay.__init__(self)
+        self.win = win
+        w,h = win.size
+        self.blankdisplay = visual.Rect(self.win,w,h,units='pix', name='BACKGROUND', fillColor=bgcolor,fillColorSpace='rgb255', lineColor=bgcolor,lineColorSpace='rgb255')
+        self.rgb_index_array = None
+        self.rgb_lut = None
+        self.imgstim_size = None
+        self.eye_image = None
+        self.imagetitlestim = None
+        self.size = (0, 0)
+        self.tmp_file = os.path.join(tempfile.gettempdir(),'_eleye.png')
+
+    # the old draw_image_line: copy pixel by pixel, then save the frame as a PNG and reload it
+    def draw_image_line_png(self, width, line, totlines, buff):
+        from PIL import Image
+        for i in range(width):
+            self.rgb_index_array[line-1, i] = buff[i]
+        if line == totlines:
+            image = Image.fromarray(self.rgb_index_array, mode='P')
+            image.putpalette(self.rgb_pallete.flatten().tolist())
+            if self.imgstim_size is None:
+                maxsz = self.win.size[0]/2
+                mx = 1.0
+                while (mx+1) * self.size[0] <= maxsz:
+                    mx += 1.0
+                self.imgstim_size = int(self.size[0]*mx), int(self.size[1]*mx)
+            image = image.resize(self.imgstim_size)
+            image.save(self.tmp_file, 'PNG')
+            if self.eye_image is None:
+                self.eye_image = visual.ImageStim(self.win, self.tmp_file, pos=(0,0), units='pix', name='ELEyeImage')
+            else:
+                self.eye_image.setImage(self.tmp_file)
+            self.blankdisplay.draw()
+            self.eye_image.draw()
+            self.win.flip()
+
+
+# --- DISPLAY FRAMES & TIME THEM --- #
+def TimeEyeImage(genv, method, frames):
+    nFrames,height,width = frames.shape
+    lines = [[bytearray(row.tobytes()) for row in frame] for frame in frames] # each line as the host sends it
+    genv.setup_image_display(width, height)
+    palette = np.linspace(0,255,256).astype(int)
+    genv.set_image_palette(palette, palette, palette)
+    if method == 'png':
+        drawLine = genv.draw_image_line_png
+    else:
+        drawLine = genv.draw_image_line
+    t = core.getTime()
+    for iFrame in range(nFrames):
+        for iLine in range(height):
+            drawLine(width, iLine+1, height, lines[iFrame][iLine])
+    return nFrames/(core.getTime()-t)
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Measure the frames/s of the EyeLink camera-setup image.')
+parser.add_argument('--frames', type=int, default=200, help='number of camera frames to display')
+parser.add_argument('--width', type=int, default=192, help='camera image width (pixels)')
+parser.add_argument('--height', type=int, default=160, help='camera image height (pixels)')
+parser.add_argument('--method', default='numpy', choices=['numpy','png','both'], help='image path to time')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    frames = np.random.randint(0, 256, size=(args.frames, args.height, args.width)).astype(np.uint8)
+    if args.method == 'both':
+        methods = ['png','numpy']
+    else:
+        methods = [args.method]
+    win = visual.Window([1024,768], units='pix', color=(255,255,255), colorSpace='rgb255')
+    try:
+        for method in methods:
+            genv = BenchmarkDisplay(win)
+            fps = TimeEyeImage(genv, method, frames)
+            print('=== %s: %.1f frames/s (%dx%d camera image)'%(method,fps,args.width,args.height))
+    finally:
+        win.close()
+        core.quit()
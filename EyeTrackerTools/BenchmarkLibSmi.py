@@ -0,0 +1,116 @@
+#!/usr/bin/env python2
+"""Measure LibSmi_PsychoPy's calibration latency, sample throughput and message latency against SmiSimulator."""
+# BenchmarkLibSmi.py
+# Created 10/16/26 by DJ.
+#
+# Runs LibSmi_PsychoPy on a simulated tracker (SmiSimulator.py, over a pseudo-terminal) and prints:
+#   calibration -- time for calibrate() to finish a calibration whose points change instantly (send/recv round trips)
+#   validation -- time for validate() to finish a (1-point) validation
+#   samples -- samples/s returned by sample() (and sample(clear=True)), and received by buffer_samples, vs. sent
+#   messages -- delay from log() being called to the message arriving at the tracker
+# Usage:
+#   python BenchmarkLibSmi.py --sampleRate 1250 --duration 5
+
+from psychopy import core
+import numpy as np
+import argparse # for command-line arguments
+import time
+from SmiSimulator import SmiSimulator
+from LibSmi_PsychoPy import LibSmi_PsychoPy
+
+
+# --- CALIBRATION --- #
+def TimeCalibration(myTracker, nRepeats, nPoints):
+    tCal = []
+    for iRepeat in range(nRepeats):
+        t = time.time()
+        myTracker.calibrate(nr_of_pts=nPoints)
+        tCal.append(time.time()-t)
+    return np.array(tCal)
+
+def TimeValidation(myTracker, nRepeats):
+    tVal = []
+    for iRepeat in range(nRepeats):
+        t = time.time()
+        myTracker.validate()
+        tVal.append(time.time()-t)
+    return np.array(tVal)
+
+
+# --- SAMPLES --- #
+def TimeSamples(myTracker, simulator, duration, clear=False):
+    myTracker.start_recording(stream=True)
+    nSent = simulator.nSamplesSent
+    nSamples = 0
+    t = time.time()
+    while time.time()-t < duration:
+        myTracker.sample(clear=clear)
+        nSamples += 1
+    tElapsed = time.time()-t
+    myTracker.stop_recording()
+    return nSamples/tElapsed, (simulator.nSamplesSent-nSent)/tElapsed
+
+def TimeBufferedSamples(myTracker, simulator, duration):
+    myTracker.start_recording(stream=True)
+    samples = myTracker.buffer_samples()
+    nSent = simulator.nSamplesSent
+    t = time.time()
+    nLatest = 0
+    while time.time()-t < duration:
+        samples.latest()
+        nLatest += 1
+    tElapsed = time.time()-t
+    myTracker.stop_recording()
+    time.sleep(0.1) # let the last samples arrive
+    myTracker.stop_buffering()
+    return samples.nSamples/tElapsed, (simulator.nSamplesSent-nSent)/tElapsed, nLatest/tElapsed
+
+
+# --- MESSAGES --- #
+def TimeMessages(myTracker, simulator, nMessages):
+    nRemarks = len(simulator.remarks)
+    tSent = []
+    for iMessage in range(nMessages):
+        tSent.append(time.time())
+        myTracker.log('benchmark message %d' % iMessage)
+        time.sleep(0.005)
+    time.sleep(0.1) # let the last messages arrive
+    tReceived = [tRemark for tRemark,msg in simulator.remarks[nRemarks:]]
+    return np.array(tReceived) - np.array(tSent[:len(tReceived)])
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Benchmark LibSmi_PsychoPy against a simulated SMI tracker.')
+parser.add_argument('--sampleRate', type=float, default=500, help='simulated samples/s (e.g. 60-1250)')
+parser.add_argument('--duration', type=float, default=3, help='seconds to read samples for, in each test')
+parser.add_argument('--calibrations', type=int, default=5, help='number of calibrations (and validations) to time')
+parser.add_argument('--points', type=int, default=13, help='number of calibration points')
+parser.add_argument('--messages', type=int, default=200, help='number of messages to time')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    simulator = SmiSimulator(sampleRate=args.sampleRate, pointDur=0.0)
+    simulator.Start()
+    myTracker = LibSmi_PsychoPy('BenchmarkLibSmi', port=simulator.port, useSound=False, w=800, h=600, fullScreen=False)
+    try:
+        tCal = TimeCalibration(myTracker, args.calibrations, args.points)
+        print('=== calibration (%d points): median %.1f ms, max %.1f ms' % (args.points, np.median(tCal)*1000, tCal.max()*1000))
+        tVal = TimeValidation(myTracker, args.calibrations)
+        print('=== validation: median %.1f ms, max %.1f ms' % (np.median(tVal)*1000, tVal.max()*1000))
+        for clear in [False, True]:
+            rate, rateSent = TimeSamples(myTracker, simulator, args.duration, clear)
+            print('=== sample(clear=%s): %.0f samples/s returned (%.0f sent)' % (clear, rate, rateSent))
+        rate, rateSent, rateLatest = TimeBufferedSamples(myTracker, simulator, args.duration)
+        print('=== buffer_samples: %.0f samples/s buffered (%.0f sent), latest() %.0f calls/s' % (rate, rateSent, rateLatest))
+        tMsg = TimeMessages(myTracker, simulator, args.messages)
+        print('=== log(): median %.2f ms, max %.2f ms to reach the tracker (%d/%d received)' % (np.median(tMsg)*1000, tMsg.max()*1000, len(tMsg), args.messages))
+    finally:
+        myTracker.cleanup()
+        simulator.Stop()
+        myTracker.win.close()
+        core.quit()
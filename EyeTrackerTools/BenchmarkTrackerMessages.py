@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+"""Measure the flip-to-flip jitter caused by sending eye tracker messages on window flips."""
+# BenchmarkTrackerMessages.py
+# Created 10/16/26 by DJ.
+#
+# Flips the window for --frames frames, sending a message on every --every'th flip, and prints the mean, SD and
+# max flip-to-flip interval and the number of frames that took over 1.5 intervals, for each way of sending:
+#   none -- no messages (baseline)
+#   direct -- win.callOnFlip(sendMessage,...), as the tasks used to do
+#   queue -- win.callOnFlip(TrackerMessageQueue.Send,...), sent from a background thread
+# --tracker sleep (default) stands in for the tracker with a function that takes --sendDelay ms. --tracker eyelink
+# sends to the EyeLink at --address (or pylink's dummy tracker if --address is 'dummy').
+# Usage:
+#   python BenchmarkTrackerMessages.py --frames 600 --every 1 --sendDelay 2
+
+from psychopy import visual, core
+import numpy as np
+import argparse # for command-line arguments
+import time
+from TrackerMessages import TrackerMessageQueue
+
+
+# --- FLIP & TIME FRAMES --- #
+def TimeFlips(win, stim, sendFunction, nFrames, every):
+    tFlips = np.zeros(nFrames)
+    for iFrame in range(nFrames):
+        stim.ori = iFrame # change something every frame
+        stim.draw()
+        if sendFunction is not None and iFrame % every == 0:
+            win.callOnFlip(sendFunction, 'Frame %d' % iFrame)
+        tFlips[iFrame] = win.flip()
+    return np.diff(tFlips)
+
+def PrintIntervals(method, intervals):
+    nSlow = np.sum(intervals > 1.5*np.median(intervals))
+    print('=== %s: mean %.2f ms, SD %.2f ms, max %.2f ms, %d/%d frames over 1.5 intervals' %
+          (method, intervals.mean()*1000, intervals.std()*1000, intervals.max()*1000, nSlow, len(intervals)))
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Measure flip-to-flip jitter with and without queued tracker messages.')
+parser.add_argument('--frames', type=int, default=600, help='number of frames to flip, for each method')
+parser.add_argument('--every', type=int, default=1, help='send a message every this many frames')
+parser.add_argument('--tracker', default='sleep', choices=['sleep','eyelink'], help='what the messages are sent to')
+parser.add_argument('--sendDelay', type=float, default=2.0, help='ms each message takes to send (--tracker sleep)')
+parser.add_argument('--address', default='100.1.1.1', help="EyeLink address, or 'dummy' (--tracker eyelink)")
+parser.add_argument('--method', default='all', choices=['none','direct','queue','all'], help='way of sending to time')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    if args.tracker == 'eyelink':
+        import pylink
+        if args.address == 'dummy':
+            tk = pylink.EyeLink(None)
+        else:
+            tk = pylink.EyeLink(args.address)
+        sendMessage = tk.sendMessage
+    else:
+        def sendMessage(message):
+            time.sleep(args.sendDelay/1000.0)
+    if args.method == 'all':
+        methods = ['none','direct','queue']
+    else:
+        methods = [args.method]
+    win = visual.Window([1024,768], units='pix', fullscr=False)
+    stim = visual.Rect(win, width=100, height=100, fillColor='white')
+    try:
+        for method in methods:
+            if method == 'none':
+                intervals = TimeFlips(win, stim, None, args.frames, args.every)
+            elif method == 'direct':
+                intervals = TimeFlips(win, stim, sendMessage, args.frames, args.every)
+            else:
+                tkMessages = TrackerMessageQueue(sendMessage)
+                intervals = TimeFlips(win, stim, tkMessages.Send, args.frames, args.every)
+                tkMessages.Close()
+                print('    (queue: %d sent, %d dropped, max delay %.1f ms)' % (tkMessages.nSent, tkMessages.nDropped, tkMessages.maxDelay*1000))
+            PrintIntervals(method, intervals)
+    finally:
+        win.close()
+        if args.tracker == 'eyelink':
+            tk.close()
+        core.quit()
@@ -26,18 +26,17 @@
 # Updated 4/10/15 by DJ - switched win units to pixels, general cleanup
 # Updated 12/1/15 by DJ - added optional bgcolor and fgcolor inputs
 # Updated 12/7/15 by DJ - added optional screenToShow and fullScreen inputs
+# Updated 10/16/26 by DJ - draw_image_line copies each line with one numpy slice, maps the palette with a lookup table
+#   and hands the RGB array straight to a persistent ImageStim (scaled on the GPU) instead of saving & reloading a PNG.
+#   Added BenchmarkEyeImage.py.
+# Updated 10/16/26 by DJ - set_image_palette builds the palette in one step, image scale is calculated once per camera resolution.
 
 
 from psychopy import visual, sound, event
 #import array
-# from python
-from PIL import Image
 import pylink
 import os.path
 import sys
-# copied from pylinkwrapper on github
-import tempfile 
-import scipy 
 import numpy as np
 
 script_home = os.path.dirname(sys.argv[0])
@@ -68,9 +67,6 @@ class EyeLinkCoreGraphicsPsychoPy(pylink.EyeLinkCustomDisplay):
         self.setTracker(tracker) 
         self.last_mouse_state = -1
         
-        # create temporary image file
-        self.tmp_file = os.path.join(tempfile.gettempdir(),'_eleye.png') # from pylinkwrapper on github
-        
         # declare variables from pylinkwrapper on github
         self.blankdisplay = visual.Rect(self.win,w,h,units='pix', name='BACKGROUND', fillColor=bgcolor,fillColorSpace='rgb255', lineColor=bgcolor,lineColorSpace='rgb255') # adapted from pylinkwrapper on github
         # declare circle sizes    
@@ -80,6 +76,7 @@ class EyeLinkCoreGraphicsPsychoPy(pylink.EyeLinkCustomDisplay):
         self.outercircle = visual.Circle(self.win,pos=(0,0), radius=outsz, fillColor=fgcolor, fillColorSpace='rgb255', lineColor=fgcolor,lineColorSpace='rgb255', units='pix',name='outercircle')
         self.innercircle = visual.Circle(self.win,pos=(0,0), radius=insz, fillColor=bgcolor, fillColorSpace='rgb255', lineColor=bgcolor,lineColorSpace='rgb255', units='pix',name='innercircle')
         self.rgb_index_array = None # rgb index array for line drawings
+        self.rgb_lut = None # palette as an rgb lookup table in psychopy's -1:1 range (index -> rgb)
         self.imgstim_size = None
         self.eye_image = None 
         self.imagetitlestim = None
@@ -258,8 +255,13 @@ class EyeLinkCoreGraphicsPsychoPy(pylink.EyeLinkCustomDisplay):
         self.clear_cal_display()
         self.last_mouse_state = -1
         # initialize rgb_index_array (from pylinkwrapper on github)
-        if self.rgb_index_array is None:
+        if self.rgb_index_array is None or self.rgb_index_array.shape != (height, width):
             self.rgb_index_array =  np.zeros((height, width), dtype = np.uint8)   
+            # scale the image up by the largest whole number that fits it in half the screen width (at least 1)
+            mx = max(int(self.win.size[0]/2.0 // width), 1)
+            self.imgstim_size = width*mx, height*mx
+            if self.eye_image is not None:
+                self.eye_image.size = self.imgstim_size
         return 1
         
     def image_title(self, text): 
@@ -283,40 +285,33 @@ class EyeLinkCoreGraphicsPsychoPy(pylink.EyeLinkCustomDisplay):
         
     def draw_image_line(self, width, line, totlines, buff):    # adapted from pylinkwrapper on github    
         """
-        Collects all lines for an eye image, saves the image,
-        then creates a psychopy imagestim from it.
+        Collects all lines for an eye image, then displays it
+        (as the texture of a psychopy imagestim).
         """        
         
-        for i in range(width):
+        # copy the line's palette indices into the image
+        try:
             try:
-                self.rgb_index_array[line-1, i] = buff[i]
-            except Exception, e:
-                print("FAILED TO DRAW PIXEL TO IMAGE LINE: %d %d"%(line-1,i))
-                # printExceptionDetailsToStdErr()
-                # print2err("FAILED TO DRAW PIXEL TO IMAGE LINE: %d %d"%(line-1,i))
+                lineData = np.frombuffer(buff, dtype=np.uint8, count=width) # bytes from the host
+            except (TypeError, ValueError): # not a byte buffer (e.g. a list of ints)
+                lineData = buff[:width]
+            self.rgb_index_array[line-1, :] = lineData
+        except (TypeError, ValueError, IndexError):
+            print("FAILED TO DRAW IMAGE LINE: %d"%(line-1))
 
-        # Once all lines have been collected, go through the hoops needed
-        # to display the frame as an image; scaled to fit the display resolution.
+        # Once all lines have been collected, display the frame as an image, scaled to fit the display resolution.
         if line == totlines:
             try:
-                image = scipy.misc.toimage(self.rgb_index_array,
-                                           pal=self.rgb_pallete,
-                                           mode='P')
-                if self.imgstim_size is None:
-                    maxsz = self.win.size[0]/2
-                    mx = 1.0
-                    while (mx+1) * self.size[0] <= maxsz:
-                        mx += 1.0
-                    self.imgstim_size = int(self.size[0]*mx), int(self.size[1]*mx)
-                image = image.resize(self.imgstim_size)
+                # look up the rgb value of each pixel
+                image = self.rgb_lut[self.rgb_index_array]
 
-                #TODO: There must be a way to just hand an ImageStim a nxmx3
-                # array for the image data??
-                image.save(self.tmp_file, 'PNG')
+                # the image is scaled up by the graphics card (without interpolation, so pixels stay square).
+                # numpy arrays start at the bottom, so flip it.
                 if self.eye_image is None:
-                    self.eye_image = visual.ImageStim(self.win, self.tmp_file, pos=(0,0), units='pix', name='ELEyeImage')
+                    self.eye_image = visual.ImageStim(self.win, image, size=self.imgstim_size, pos=(0,0), units='pix', 
+                                                      flipVert=True, interpolate=False, name='ELEyeImage')
                 else:
-                    self.eye_image.setImage(self.tmp_file)
+                    self.eye_image.setImage(image)
 
                 # Redraw the Camera Setup Mode graphics
                 self.blankdisplay.draw()
@@ -342,9 +337,8 @@ class EyeLinkCoreGraphicsPsychoPy(pylink.EyeLinkCustomDisplay):
         """
         self.clear_cal_display()
         sz = len(r)
-        self.rgb_pallete = np.zeros((sz, 3), dtype=np.uint8)
-        i = 0
-        while i < sz:
-            self.rgb_pallete[i:] = int(r[i]), int(g[i]), int(b[i])
-            i += 1
+        self.rgb_pallete = np.column_stack((np.asarray(r, dtype=int), np.asarray(g, dtype=int), np.asarray(b, dtype=int))).astype(np.uint8)
+        # make a lookup table for all 256 possible indices (any not in the palette are black)
+        self.rgb_lut = -np.ones((256, 3), dtype=np.float32)
+        self.rgb_lut[:min(sz,256)] = self.rgb_pallete[:256]/127.5 - 1.0
         
\ No newline at end of file
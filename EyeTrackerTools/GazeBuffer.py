@@ -0,0 +1,104 @@
+#!/usr/bin/env python2
+"""Ring buffer of gaze samples (t,x,y) that can be read while another thread fills it, and optionally saved to disk."""
+# GazeBuffer.py
+# Created 10/16/26 by DJ.
+#
+# LibSmi_PsychoPy's reader thread adds each ET_SPL sample to a GazeBuffer as it arrives (see
+# LibSmi_PsychoPy.buffer_samples), so the experiment can get the latest sample, or the samples in a time window,
+# without waiting on the serial port. The buffer is allocated once. If filename is given, every sample is also
+# written to that file in blocks (float64 t,x,y rows), so the whole session is kept even after the buffer wraps.
+# Usage:
+#   samples = GazeBuffer(filename='gaze.dat')
+#   samples.Add(t,x,y) # in the reader thread
+#   t,x,y = samples.latest()
+#   samples.WaitForSample(samples.nSamples, 0.01) # wait up to 10 ms for the next sample
+#   recent = samples.window(t-0.5,t) # n x 3 array
+#   allSamples = ReadGazeFile('gaze.dat')
+
+import threading # so readers don't see rows being overwritten, and can wait for new ones
+import numpy as np # for the buffer
+
+
+class GazeBuffer(object):
+    def __init__(self, capacity=2**17, filename=None, blockSize=1024): # 2**17 samples = 105 s at 1250Hz
+        if capacity % blockSize != 0:
+            raise ValueError('capacity (%d) must be a multiple of blockSize (%d)!'%(capacity,blockSize))
+        self.capacity = capacity
+        self.blockSize = blockSize
+        self.buffer = np.zeros((capacity,3))
+        self.nSamples = 0 # total samples added (the newest is at (nSamples-1) % capacity)
+        self.nSaved = 0 # samples written to the file
+        self.lock = threading.Condition() # held while a row is written, and while latest/window copy rows out (notified on each Add)
+        if filename is None:
+            self.file = None
+        else:
+            self.file = open(filename,'ab')
+
+    # Add a sample (only one thread should add samples)
+    def Add(self, t, x, y):
+        iSample = self.nSamples % self.capacity
+        with self.lock:
+            self.buffer[iSample,0] = t
+            self.buffer[iSample,1] = x
+            self.buffer[iSample,2] = y
+            self.nSamples += 1
+            self.lock.notify_all() # wake up WaitForSample
+        # save each block as it's filled
+        if self.file is not None and self.nSamples - self.nSaved >= self.blockSize:
+            self.Save()
+
+    # Write the samples that haven't been saved yet to the file
+    def Save(self):
+        nSamples = self.nSamples
+        if self.nSaved < nSamples - self.capacity: # the buffer wrapped before they were saved
+            self.nSaved = nSamples - self.capacity
+        while self.nSaved < nSamples:
+            iStart = self.nSaved % self.capacity
+            nToSave = min(nSamples-self.nSaved, self.capacity-iStart) # up to the end of the buffer
+            self.buffer[iStart:iStart+nToSave].tofile(self.file)
+            self.nSaved += nToSave
+        self.file.flush()
+
+    def Close(self):
+        if self.file is not None:
+            self.Save()
+            self.file.close()
+            self.file = None
+
+    # Wait (up to timeout s) until there are more than nSamples samples. Returns True if there are.
+    def WaitForSample(self, nSamples, timeout):
+        with self.lock:
+            if self.nSamples == nSamples:
+                self.lock.wait(timeout)
+            return self.nSamples != nSamples
+
+    # Get the newest sample as a (t,x,y) tuple, or None if there isn't one yet
+    def latest(self):
+        with self.lock:
+            nSamples = self.nSamples
+            if nSamples == 0:
+                return None
+            t,x,y = self.buffer[(nSamples-1) % self.capacity]
+        return t,x,y
+
+    # Get the samples with t0 <= t <= t1 that are still in the buffer, as an n x 3 array (oldest first)
+    def window(self, t0, t1):
+        # search and copy under the lock, so the writer can't overwrite the rows (once the buffer has wrapped) mid-read
+        with self.lock:
+            nSamples = self.nSamples
+            nKept = min(nSamples, self.capacity)
+            iOldest = (nSamples-nKept) % self.capacity
+            # the kept samples are in (up to) two runs of increasing times: iOldest to the end, then the start of the buffer
+            segments = []
+            for iStart,iEnd in [(iOldest,min(iOldest+nKept,self.capacity)), (0,max(iOldest+nKept-self.capacity,0))]:
+                times = self.buffer[iStart:iEnd,0]
+                iFirst = iStart + np.searchsorted(times, t0, side='left')
+                iLast = iStart + np.searchsorted(times, t1, side='right')
+                segments.append(self.buffer[iFirst:iLast])
+            return np.concatenate(segments) # a copy
+
+
+# Read all the samples saved by a GazeBuffer, as an n x 3 array of t,x,y rows
+def ReadGazeFile(filename):
+    samples = np.fromfile(filename, dtype=np.float64)
+    return samples[:len(samples)//3*3].reshape(-1,3)
@@ -19,12 +19,24 @@ See https://github.com/djangraw/PsychoPyParadigms/blob/master/README.md for lice
 # Updated 11/17/15 by DJ - changed default calibration params to most conservative ones. Updated comments.
 # Updated 1/11/16 by DJ - added start_movie and end_movie functions, added save_eye_movie input to calibrate and run_calibration fns
 # Updated 1/29/16 by DJ - switched from save_eye_movie to eye_movie_filename and eye_movie_format inputs in claibration functions
+# Updated 10/16/26 by DJ - a background thread reads the serial port in bulk into a queue of lines, recv waits on the queue,
+#   send takes a lock (log passes sleep=0, so remarks are written back to back),
+#   commands that have to wait for the last one's sleep are sent by a writer thread, so send doesn't block,
+#   clear drops queued lines instead of flushing the port (the reader owns it, and a flush made its read fail).
+# Updated 10/16/26 by DJ - added buffer_samples: the reader thread puts streamed samples in a GazeBuffer (latest/window access),
+#   sample waits for new samples on the buffer (GazeBuffer.WaitForSample) for at most MaxReadTime, and returns None on q/escape.
 
 # import libraries
 import os.path
 import time
 import serial
+import threading # for the background reader
+try:
+    import Queue as queue # Python 2
+except ImportError:
+    import queue # Python 3
 from psychopy import visual, sound, event, core
+from GazeBuffer import GazeBuffer # for buffering streamed samples
 """
 from libopensesame import exceptions
 from openexp.canvas import canvas
@@ -46,7 +58,7 @@ class LibSmi_PsychoPy:
     
     version = 0.10
 
-    def __init__(self, experiment, port='COM1', baudrate=115200, useSound=True, w=1024, h=768, bgcolor=(255,255,255), fgcolor=(0,0,0), fullScreen=True, screenToShow=0):
+    def __init__(self, experiment, port='COM1', baudrate=115200, useSound=True, w=1024, h=768, bgcolor=(255,255,255), fgcolor=(0,0,0), fullScreen=True, screenToShow=0, sendSleep=10):
     
         """<DOC>
         Initializes the SMI tracker class
@@ -58,6 +70,7 @@ class LibSmi_PsychoPy:
         useSound -- indicates if sounds should be played to inidicate success or failure
         w,h -- the width and height, in pixels, of the desired window.
         bgcolor -- background (rgb255) of 
+        sendSleep -- the default time, in ms, between a command and the next one sent to the tracker (default=10)
         </DOC>"""
         
         # set parameters
@@ -85,61 +98,176 @@ class LibSmi_PsychoPy:
             self.beep2 = sound.Sound(value=440, secs=0.200, volume=0.1)
         # create clock (for debugging)
         self.clock = core.Clock()
+        # start reading lines from the tracker in the background
+        self.lines = queue.Queue() # complete lines received from the tracker
+        self.readError = None # error that stopped the reader, if any
+        self.sendLock = threading.Lock() # so commands from different threads aren't interleaved
+        self.sendSleep = sendSleep # ms between commands, unless send is told otherwise
+        self.commands = queue.Queue() # (message, sleep) waiting for the writer thread
+        self.nCommandsWaiting = 0 # commands in self.commands or being written
+        self.tNextSend = 0 # when (on self.clock) the last command's sleep is over
+        self.samples = None # GazeBuffer for streamed samples (see buffer_samples)
+        self.samplesLock = threading.Lock() # held while the reader adds a sample
+        self.reading = True
+        self.readerThread = threading.Thread(target=self.read_lines, name='LibSmiReader')
+        self.readerThread.daemon = True # don't keep python open if cleanup isn't called
+        self.readerThread.start()
+        # write commands that have to wait for the last one's sleep in the background
+        self.writerThread = threading.Thread(target=self.write_commands, name='LibSmiWriter')
+        self.writerThread.daemon = True
+        self.writerThread.start()
         # make sure recording is stopped
         self.stop_recording()
         
-    def send(self, msg, sleep=10):
+    def read_lines(self):
     
         """<DOC>
-        Send a message to the tracker
+        Read from the tracker until cleanup is called (runs in a background thread).
+        Everything waiting on the serial port is read at once, split into lines, and
+        each line is added to self.lines (the tab-linefeed is stripped off).
+        </DOC>"""
+        
+        partial = '' # start of a line that hasn't finished arriving
+        while self.reading:
+            try:
+                # wait for a byte (up to the port's timeout), then take everything else that's waiting
+                data = self.tracker.read(size=1)
+                if data:
+                    data += self.tracker.read(size=self.tracker.inWaiting())
+            except Exception as err: # e.g. port closed or unplugged
+                if self.reading:
+                    self.readError = err
+                    self.lines.put(None) # wake up recv
+                break
+            if not data:
+                continue
+            # split into lines
+            lines = (partial + data).split('\n')
+            partial = lines.pop() # last piece has no linefeed yet
+            for line in lines:
+                if len(line) > 1: # skip empty lines
+                    if self.samples is not None and line.startswith('ET_SPL'):
+                        self.add_sample(line[:-1])
+                    else:
+                        self.lines.put(line[:-1]) # Strip off the tab
+        
+    def add_sample(self, s):
+    
+        """<DOC>
+        Parse an ET_SPL line and add it to self.samples, timestamped with self.clock
+        (runs in the reader thread).
+        </DOC>"""
+        
+        t = self.clock.getTime()
+        l = s.split()
+        try:
+            x = int(l[1])
+            if len(l) == 5:
+                y = int(l[3]) # Binocular
+            else:
+                y = int(l[2]) # One eye
+        except (IndexError, ValueError):
+            return
+        with self.samplesLock:
+            if self.samples is not None:
+                self.samples.Add(t, x, y)
+        
+    def send(self, msg, sleep=None):
+    
+        """<DOC>
+        Send a message to the tracker without waiting. If the tracker isn't
+        due a command yet (the last one's sleep isn't over, or others are
+        waiting), the message is queued and the writer thread sends it when
+        it is, so commands still reach the tracker in order and spaced out.
         
         Arguments:
         msg -- a string containing the message
         
         Keyword arguments:
-        sleep -- a value in milliseconds to sleep after the command has been
-                 sent to avoid overflowing (default=10)
+        sleep -- a value in milliseconds to wait after the command has been
+                 sent, before sending the next one, to avoid overflowing
+                 (default=None: self.sendSleep, 10 unless set in __init__)
+        </DOC>"""
+        
+        if sleep is None:
+            sleep = self.sendSleep
+        with self.sendLock:
+            if self.nCommandsWaiting == 0 and self.clock.getTime() >= self.tNextSend:
+                self.write_command(msg, sleep) # nothing to wait for
+                return
+            self.nCommandsWaiting += 1
+            self.commands.put((msg, sleep))
+            
+    def write_command(self, msg, sleep):
+    
+        """<DOC>
+        Write a message to the tracker now and note when the next one can
+        be sent (call with self.sendLock held).
         </DOC>"""
         
         # The message needs to be end with a tab-linefeed
         nBytes = self.tracker.write('%s\t\n' % msg)
-        core.wait(0.001*sleep)
+        self.tNextSend = self.clock.getTime() + 0.001*sleep
         print("sent %d bytes: %s"%(nBytes,msg))
         
+    def write_commands(self):
+    
+        """<DOC>
+        Write queued commands to the tracker, each after the last one's
+        sleep is over, until cleanup is called (runs in a background thread).
+        </DOC>"""
+        
+        while True:
+            item = self.commands.get()
+            if item is None: # cleanup was called
+                break
+            msg, sleep = item
+            tWait = self.tNextSend - self.clock.getTime()
+            if tWait > 0:
+                time.sleep(tWait)
+            with self.sendLock:
+                try:
+                    self.write_command(msg, sleep)
+                except Exception as err: # e.g. port closed
+                    print('sending %s failed: %s'%(msg, err))
+                self.nCommandsWaiting -= 1
+        
     def recv(self, MaxReadTime=float('inf')):
     
         """<DOC>
         Receive a message from the tracker
         
+        Keyword arguments:
+        MaxReadTime -- the maximum time to wait for a message, in seconds
+                       (default=inf)
+        
         Returns:
-        A message (the tab-linefeed is stripped off)
+        A message (the tab-linefeed is stripped off), '' if MaxReadTime passed first,
+        or 'ABORT' if q or escape was pressed.
         </DOC>"""
         
         # Keep track of read start time
         startReadTime = self.clock.getTime()
-        # Receive a line from the tracker
-        s = ''
+        # Wait for a line from the tracker
         while True:
-            c = self.tracker.read(size=1)      
-            if c == None:
-                raise exceptions.runtime_error('The tracker said "%s"' % s)
-            if c == '\n':
-                if len(s) > 1:
-                    break
-                else:
-                    s = ''
-                    continue
-            s += c
+            try:
+                s = self.lines.get(timeout=min(0.01, MaxReadTime))
+                break
+            except queue.Empty:
+                pass
             # check for escape keys
             key = event.getKeys()
             if (len(key) > 0 and key[0] in ['q','Escape']):
-                s = 'ABORT\n'
+                s = 'ABORT'
                 break
             if (self.clock.getTime()-startReadTime > MaxReadTime):
-                s += '\n'
+                s = ''
                 break
+        if s is None: # the reader stopped
+            self.lines.put(None) # so later calls also see it
+            raise Exception('Reading from the tracker failed: %s' % self.readError)
         print('received %s'%s)
-        return s[:-1] # Strip off the tab and return
+        return s
                 
     def calibrate(self, nr_of_pts=13, auto_accept=False, go_fast=False, calib_level=3, eye_movie_filename=None, eye_movie_format='XMP4'):
         
@@ -558,12 +686,28 @@ class LibSmi_PsychoPy:
     def clear(self):
         
         """<DOC>
-        Clear the input buffer
+        Clear the input buffer (and any lines already read from it)
+        </DOC>"""
+        
+        # the reader thread keeps the serial port drained (flushing the port
+        # here would make its read fail), so discarding its lines is enough
+        self.clear_lines()
+        
+    def clear_lines(self):
+        
+        """<DOC>
+        Discard the lines that have been received but not read with recv
         </DOC>"""
         
-        self.tracker.flushInput()
+        try:
+            while True:
+                if self.lines.get_nowait() is None: # keep reader errors
+                    self.lines.put(None)
+                    break
+        except queue.Empty:
+            pass
         
-    def sample(self, clear=False):
+    def sample(self, clear=False, MaxReadTime=5.0):
         
         """<DOC>
         Retrieve the current gaze position from the tracker. If binocular
@@ -572,19 +716,54 @@ class LibSmi_PsychoPy:
         Keyword arguments:
         clear -- indicates if the input buffer should be flushed so that an
                  up-to-date sample is returned (default=False)
+        MaxReadTime -- the maximum time to wait for a sample, in seconds
+                       (default=5.0)
         
         Returns:
-        An (x,y) tuple
+        An (x,y) tuple, or None if q or escape was pressed while waiting
+        
+        If buffer_samples has been called, the newest buffered sample is returned
+        without waiting (unless there hasn't been one yet, or clear is True, in
+        which case the next sample is waited for).
+        
+        Exceptions:
+        Throws an Exception if no sample arrives within MaxReadTime, or if
+        reading from the tracker stops while waiting.
         </DOC>"""
         
         if not self.streaming:
             raise exceptions.runtime_error("Please set stream=True in start_recording() before using sample()")
             
+        startReadTime = self.clock.getTime()
+        samples = self.samples
+        if samples is not None:
+            nSamples = samples.nSamples
+            if clear or nSamples == 0:
+                # wait for the reader to add a sample, checking for problems & escape keys every 10 ms
+                while not samples.WaitForSample(nSamples, 0.01):
+                    # check that samples are still coming in
+                    if self.readError is not None or not self.readerThread.is_alive():
+                        raise Exception('Reading from the tracker failed: %s' % self.readError)
+                    if self.samples is not samples:
+                        raise Exception('Samples stopped being buffered while sample() was waiting for one.')
+                    # check for escape keys
+                    key = event.getKeys()
+                    if (len(key) > 0 and key[0] in ['q','Escape']):
+                        return None
+                    if (self.clock.getTime()-startReadTime > MaxReadTime):
+                        raise Exception('No sample received from the tracker in %g s. Is it still streaming?' % MaxReadTime)
+            t, x, y = samples.latest()
+            return int(x), int(y)
+            
         if clear:
-            self.tracker.flushInput()
+            self.clear()
         
         while True:
-            s = self.recv()
+            s = self.recv(MaxReadTime=max(MaxReadTime-(self.clock.getTime()-startReadTime), 0))
+            if s == 'ABORT':
+                return None
+            if s == '':
+                raise Exception('No sample received from the tracker in %g s. Is it still streaming?' % MaxReadTime)
             l = s.split()
             if len(l) > 0 and l[0] == 'ET_SPL':
                 try:
@@ -599,6 +778,39 @@ class LibSmi_PsychoPy:
                 
         return x, y
         
+    def buffer_samples(self, capacity=2**17, filename=None):
+        
+        """<DOC>
+        Put streamed samples (see start_recording) in a GazeBuffer instead of
+        the line queue, as they arrive.
+        
+        Keyword arguments:
+        capacity -- the number of samples kept in memory (default=2**17, 105 s at 1250Hz)
+        filename -- a file where every sample is also saved (as float64 t,x,y rows,
+                    read with GazeBuffer.ReadGazeFile), or None to not save them (default=None)
+        
+        Returns:
+        The GazeBuffer, whose latest() and window(t0,t1) methods give the newest
+        sample and the samples in a time window. Times are on self.clock.
+        </DOC>"""
+        
+        self.stop_buffering()
+        self.samples = GazeBuffer(capacity=capacity, filename=filename)
+        return self.samples
+        
+    def stop_buffering(self):
+        
+        """<DOC>
+        Stop buffering samples (streamed samples go back to the line queue) and
+        save any that haven't been saved yet.
+        </DOC>"""
+        
+        with self.samplesLock:
+            samples = self.samples
+            self.samples = None
+        if samples is not None:
+            samples.Close()
+        
     def log(self, msg):
         
         """<DOC>
@@ -608,7 +820,7 @@ class LibSmi_PsychoPy:
         msg -- a string containing the message
         </DOC>"""
         
-        self.send('ET_REM "%s"' % msg)
+        self.send('ET_REM "%s"' % msg, sleep=0) # don't hold up the caller (remarks are sent during the task)
         
     def cleanup(self):
         
@@ -616,6 +828,12 @@ class LibSmi_PsychoPy:
         Neatly close the tracker
         </DOC>"""
         
+        # send the commands still waiting, then stop the writer and the reader (it notices within the port's timeout)
+        self.commands.put(None)
+        self.writerThread.join()
+        self.reading = False
+        self.readerThread.join()
+        self.stop_buffering()
         self.tracker.close()
         
     def start_movie(self, format='XMP4',filename='movie', path='', duration_ms=None):
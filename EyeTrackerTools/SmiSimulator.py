@@ -0,0 +1,171 @@
+#!/usr/bin/env python2
+"""Simulate an SMI iViewX tracker on a pseudo-terminal, so LibSmi_PsychoPy can be run and profiled without one."""
+# SmiSimulator.py
+# Created 10/16/26 by DJ.
+#
+# Opens a pty pair (Linux/Mac) and answers the serial commands LibSmi_PsychoPy sends:
+#   ET_CPA/ET_LEV/ET_CSZ/ET_DEF -- calibration settings (ET_CSZ sets the point positions)
+#   ET_CAL n -- sends ET_PNT for each point, then ET_CHG for each point (pointDur s apart), then ET_FIN
+#   ET_VLS -- sends ET_PNT and ET_CHG for the center point, then ET_VLS with (made up) validation results
+#   ET_REC/ET_STR/ET_EST/ET_STP -- recording; while streaming, ET_SPL samples are sent at sampleRate Hz
+#   ET_REM "msg" -- the message and the time it arrived are saved in self.remarks
+# Anything else (ET_SAV, ET_EVB, ...) is accepted and ignored. Each command and the time it arrived is saved
+# in self.commands. Samples follow a circle around the screen center (binocular=True sends ET_SPL xL xR yL yR).
+# Usage:
+#   python SmiSimulator.py --sampleRate 500 # then use the printed port as LibSmi_PsychoPy's port
+# or, in the same script as the tracker:
+#   simulator = SmiSimulator(sampleRate=500); simulator.Start()
+#   myTracker = LibSmi_PsychoPy('test', port=simulator.port, ...)
+
+import os
+import pty
+import tty
+import select
+import threading
+import time
+import math
+import argparse # for command-line arguments
+
+
+class SmiSimulator(object):
+    def __init__(self, sampleRate=60, pointDur=0.0, binocular=False, screenSize=(1024,768)):
+        self.sampleRate = float(sampleRate)
+        self.pointDur = pointDur
+        self.binocular = binocular
+        self.screenSize = screenSize
+        # open the pty pair: the tracker end (master) and the port to give LibSmi_PsychoPy (slave)
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave) # no echo or line editing
+        self.port = os.ttyname(self.slave)
+        # state
+        self.streaming = False
+        self.nSamplesSent = 0
+        self.commands = [] # (time received, command)
+        self.remarks = [] # (time received, message)
+        self.writeLock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    # --- SEND TO THE EXPERIMENT --- #
+    def Write(self, lines):
+        data = ''.join(['%s\t\n' % line for line in lines])
+        with self.writeLock:
+            os.write(self.master, data.encode('ascii'))
+
+    def GetCalibrationPoints(self, nPoints):
+        # center first, then corners, then edges, then the points between them (as in LibSmi_PsychoPy.validate_manual)
+        w,h = self.screenSize
+        pts = [(0.5,0.5), (0.05,0.05),(0.95,0.05), (0.05,0.95),(0.95,0.95), (0.05,0.5), (0.5,0.05), (0.95,0.5), (0.5,0.95),
+               (0.275,0.275),(0.725,0.275), (0.275,0.725),(0.725,0.725)]
+        return [(int(w*x),int(h*y)) for x,y in pts[:nPoints]]
+
+    # --- ANSWER A COMMAND --- #
+    def HandleCommand(self, line):
+        tReceived = time.time()
+        self.commands.append((tReceived, line))
+        cmd = line.split()
+        if len(cmd) == 0:
+            return
+        if cmd[0] == 'ET_CSZ':
+            self.screenSize = (int(cmd[1]), int(cmd[2]))
+        elif cmd[0] == 'ET_CAL':
+            pts = self.GetCalibrationPoints(int(cmd[1]))
+            self.Write(['ET_PNT %d %d %d' % (iPt+1, x, y) for iPt,(x,y) in enumerate(pts)])
+            for iPt in range(len(pts)):
+                time.sleep(self.pointDur)
+                self.Write(['ET_CHG %d' % (iPt+1)])
+            self.Write(['ET_FIN'])
+        elif cmd[0] == 'ET_VLS':
+            x,y = self.GetCalibrationPoints(1)[0]
+            self.Write(['ET_PNT 1 %d %d' % (x, y)]) # validate expects the point before it changes to it
+            time.sleep(self.pointDur)
+            self.Write(['ET_CHG 1'])
+            time.sleep(self.pointDur)
+            self.Write(['ET_VLS left %d %d 0.5 0.30d 0.40d' % (x, y)])
+        elif cmd[0] == 'ET_STR':
+            self.tStreamStart = time.time()
+            self.nStreamSamples = 0
+            self.streaming = True
+        elif cmd[0] in ['ET_EST','ET_STP']:
+            self.streaming = False
+        elif cmd[0] == 'ET_REM':
+            self.remarks.append((tReceived, line[len('ET_REM '):].strip('"')))
+
+    # --- SEND THE SAMPLES THAT ARE DUE --- #
+    def SendSamples(self):
+        nDue = int((time.time()-self.tStreamStart)*self.sampleRate) - self.nStreamSamples
+        if nDue <= 0:
+            return
+        lines = []
+        w,h = self.screenSize
+        for iSample in range(self.nStreamSamples, self.nStreamSamples+nDue):
+            angle = 2*math.pi*iSample/self.sampleRate # one circle per second
+            x = int(w/2 + w/4*math.cos(angle))
+            y = int(h/2 + h/4*math.sin(angle))
+            if self.binocular:
+                lines.append('ET_SPL %d %d %d %d' % (x, x, y, y))
+            else:
+                lines.append('ET_SPL %d %d' % (x, y))
+        self.Write(lines)
+        self.nStreamSamples += nDue
+        self.nSamplesSent += nDue
+
+    # --- RUN --- #
+    def Run(self):
+        partial = ''
+        while self.running:
+            # wait for a command (or until the next sample is due)
+            if self.streaming:
+                timeout = 0.5/self.sampleRate
+            else:
+                timeout = 0.05
+            readable,_,_ = select.select([self.master], [], [], timeout)
+            if readable:
+                try:
+                    data = os.read(self.master, 4096).decode('ascii')
+                except OSError: # the other end was closed
+                    break
+                lines = (partial + data).split('\n')
+                partial = lines.pop()
+                for line in lines:
+                    self.HandleCommand(line.rstrip('\t'))
+            if self.streaming:
+                self.SendSamples()
+
+    def Start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.Run, name='SmiSimulator')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def Stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        os.close(self.master)
+        os.close(self.slave)
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Simulate an SMI tracker on a pseudo-terminal.')
+parser.add_argument('--sampleRate', type=float, default=60, help='samples/s while streaming (e.g. 60-1250)')
+parser.add_argument('--pointDur', type=float, default=1.0, help='seconds spent on each calibration/validation point')
+parser.add_argument('--binocular', action='store_true', help='send binocular samples')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    simulator = SmiSimulator(sampleRate=args.sampleRate, pointDur=args.pointDur, binocular=args.binocular)
+    simulator.Start()
+    print('Simulated SMI tracker on port %s (Ctrl-C to stop)' % simulator.port)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    simulator.Stop()
+    print('Received %d commands, sent %d samples.' % (len(simulator.commands), simulator.nSamplesSent))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python2
+"""Send messages to an eye tracker from a background thread, so a message sent on a flip doesn't delay the next frame."""
+# TrackerMessages.py
+# Created 10/16/26 by DJ.
+#
+# A message sent with win.callOnFlip(tk.sendMessage,...) is sent right after the buffer swap, and the next
+# frame can't start until the tracker has it. TrackerMessageQueue.Send only notes the time and puts the message
+# in a queue: a background thread does the sending. So that the tracker still gets the flip time, each message
+# is sent with the EyeLink time-offset prefix: "<ms since Send was called> <message>" (the tracker's message
+# time minus the offset is the flip time). offsetPrefix=False sends messages as they are, for trackers without
+# this convention, but then they're stamped late by the time they spent in the queue. (SMI's iView stamps an ET_REM
+# when it arrives, and LibSmi_PsychoPy.log doesn't wait after writing, so SMI tasks call it directly instead.)
+# If the queue is full (maxSize messages waiting), the message is dropped and counted in nDropped.
+# Usage:
+#   tkMessages = TrackerMessageQueue(tk.sendMessage)
+#   win.callOnFlip(tkMessages.Send,'Display Fixation')
+#   ...
+#   tkMessages.Flush() # wait until they've been sent (before e.g. tk.doTrackerSetup(), which uses the link)
+#   tkMessages.Close() # send what's left (before stopping the tracker)
+
+import threading # for the sender
+import time
+try:
+    import Queue as queue # Python 2
+except ImportError:
+    import queue # Python 3
+from psychopy import core, logging
+
+
+class TrackerMessageQueue(object):
+    def __init__(self, sendFunction, maxSize=256, offsetPrefix=True):
+        self.sendFunction = sendFunction # e.g. tk.sendMessage (EyeLink)
+        self.offsetPrefix = offsetPrefix
+        self.messages = queue.Queue(maxsize=maxSize) # (time of Send, message)
+        self.nQueued = 0
+        self.nSent = 0
+        self.nDropped = 0 # messages that didn't fit in the queue
+        self.nFailed = 0 # messages sendFunction raised an error on
+        self.maxDelay = 0.0 # longest time (s) from Send to sending
+        self.thread = threading.Thread(target=self.Run, name='TrackerMessages')
+        self.thread.daemon = True # don't keep python open if Close isn't called
+        self.thread.start()
+
+    # Queue a message (call with win.callOnFlip to stamp it with the flip time)
+    def Send(self, message):
+        try:
+            self.messages.put_nowait((core.getTime(), message))
+            self.nQueued += 1
+        except queue.Full:
+            self.nDropped += 1
+
+    # Send queued messages until Close is called (runs in the background thread)
+    def Run(self):
+        while True:
+            item = self.messages.get()
+            if item is None: # Close was called
+                break
+            tSend, message = item
+            delay = core.getTime() - tSend
+            self.maxDelay = max(self.maxDelay, delay)
+            if self.offsetPrefix:
+                message = '%d %s' % (int(round(delay*1000)), message)
+            try:
+                self.sendFunction(message)
+                self.nSent += 1
+            except Exception as err: # keep going, so one bad message doesn't stop the rest
+                self.nFailed += 1
+                logging.error('Sending tracker message "%s" failed: %s' % (message, err))
+
+    # Wait (up to timeout s) until the queued messages have been sent, e.g. before using the tracker directly
+    def Flush(self, timeout=1.0):
+        tEnd = core.getTime() + timeout
+        while self.nSent + self.nFailed < self.nQueued and core.getTime() < tEnd:
+            time.sleep(0.001)
+
+    # Send the messages still in the queue (waiting up to timeout s), then stop the thread
+    def Close(self, timeout=1.0):
+        if not self.thread.is_alive():
+            return
+        try:
+            self.messages.put(None, timeout=timeout) # after the queued messages
+            self.thread.join(timeout)
+        except queue.Full: # the sender is stuck
+            pass
+        logging.log(level=logging.INFO, msg='Tracker messages: %d sent, %d dropped, %d failed, max delay %.1f ms' %
+                    (self.nSent, self.nDropped, self.nFailed, self.maxDelay*1000))
+        if self.nDropped > 0:
+            logging.warning('%d tracker messages were dropped because the queue was full!' % self.nDropped)
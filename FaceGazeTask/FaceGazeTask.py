@@ -13,6 +13,7 @@ Display images to the subject while collecting EyeLink eye tracking data.
 * Updated 2/6/19 by DJ - made fix cross text instead of shapeStim (to make it thicker), fixed screenRes display in fullscreen mode
 * Updated 3/18/19 by DJ - added ExperimentHandler to cleanly log trial data, param respKeys to specify which responses are allowed
 * Updated 3/27/19 by DJ - allow user to decide whether to detect screen resolution automatically or pass it as a parameter.
+* Updated 10/16/26 by DJ - EyeLink messages are sent from a background thread (TrackerMessageQueue) so they don't delay the next flip.
 """
 
 # Import packages
@@ -29,6 +30,7 @@ import io # for reading files with specified newlines
 # EyeLink packages
 import pylink # for eye tracker interface
 from EyeLinkCoreGraphicsPsychoPy import EyeLinkCoreGraphicsPsychoPy
+from TrackerMessages import TrackerMessageQueue # for sending messages without delaying the next flip
 
 # ====================== #
 # ===== PARAMETERS ===== #
@@ -321,6 +323,9 @@ tk.sendCommand("screen_pixel_coords = 0 0 %d %d" % (scnWidth-1, scnHeight-1))
 # [see Data Viewer User Manual, Section 7: Protocol for EyeLink Data to Viewer Integration]
 tk.sendMessage("DISPLAY_COORDS = 0 0 %d %d" % (scnWidth-1, scnHeight-1))
 
+# send the task's messages from a background thread, stamped with the time they were queued (the flip time)
+tkMessages = TrackerMessageQueue(tk.sendMessage)
+
 # specify the calibration type, H3, HV3, HV5, HV13 (HV = horiztonal/vertical),
 tk.sendCommand("calibration_type = %s"%params['eyeCalibType']) # tk.setCalibrationType('HV9') also works, see the Pylink manual
 
@@ -395,7 +400,7 @@ def WaitForFlipTime():
 # Send EyeLink event
 def SendEyeEvent(eventText):
     logging.log(level=logging.EXP,msg="sent event '%s' to tracker"%(eventText))
-    tk.sendMessage(eventText)
+    tkMessages.Send(eventText)
 
 # Wait for scanner, then display a fixation cross
 def WaitForScanner():
@@ -467,7 +472,8 @@ def CoolDown():
     thisExp.nextEntry() # advance data file
     thisExp.saveAsWideText(filename + '.csv')
     
-    # stop recording eye data
+    # send the messages still waiting, then stop recording eye data
+    tkMessages.Close()
     pylink.endRealTimeMode()
     pylink.pumpDelay(100)
     error = tk.stopRecording()
@@ -534,6 +540,7 @@ win.flip()
 # set up the camera and calibrate the eye tracker at the beginning of each run
 outLog.setLevel(logging.DATA)
 logging.console.setLevel(logging.DATA)
+tkMessages.Flush() # so the tracker link isn't used by both threads
 tk.doTrackerSetup()
 # set logging level back
 outLog.setLevel(logging.INFO)
@@ -9,86 +9,95 @@
 # Updated 11/12/15 by DJ - moved visual package import to fns so it doesn't interfere with parent script's GUI (weird PsychoPy bug)
 # Updated 9/13/18 by DJ - added ignoreKeys parameter to RunPrompts function (for trigger keys)
 # Updated 10/11/18 by DJ - prevent RunPrompts from redrawing/logging every time an ignored key is pressed.
+# Updated 10/16/26 by DJ - added PromptDeck class and deck input to RunPrompts (pre-rendered prompt pages).
+# Updated 10/16/26 by DJ - question & prompt files are parsed by QuestionBank.py, which caches them.
+# Updated 10/16/26 by DJ - added WaitForKeys, so RunQuestions(_Move) wait for input events instead of polling getKeys.
+# Updated 10/16/26 by DJ - RunQuestions_Move keeps a normal & bold stim per option instead of re-rendering text to move the selection.
 
 from psychopy import core, event, logging#, visual
 import time
+import QuestionBank # for parsing (and caching) question & prompt files
 
 
 # --- PARSE QUESTION FILE INTO QUESTIONS AND OPTIONS --- #
-def ParseQuestionFile(filename,optionsType=None): # optionsType 'Likert' returns the Likert scale for every question's options.
-    # initialize
-    questions_all = []
-    answers_all = []
-    options_all = []
-    if optionsType is None:
-        options_this = []
-    elif optionsType == 'Likert':
-        options_likert = ['Strongly agree','Agree','Neutral','Disagree','Strongly disagree']
-        options_this = options_likert
-        
-    # parse questions & answers
-    with open(filename) as f:
-        for line in f:
-            # remove the newline character at the end of the line
-            line = line.replace('\n','')
-            # replace any newline strings with newline characters
-            line = line.replace('\\n','\n')
-            # pass to proper output
-            if line.startswith("-"): # incorrect answer
-                options_this.append(line[1:]) # omit leading -
-            elif line.startswith("+"): # correct answer
-                options_this.append(line[1:]) # omit leading +
-                answers_all.append(len(options_this))
-            elif line.startswith("?"): # question
-                questions_all.append(line[1:]) # omit leading ?
-                # if it's not the first question, add the options to the list.
-                if options_this:
-                    options_all.append(options_this)
-                    if optionsType is None:
-                        options_this = [] #reset
-                    elif optionsType == 'Likert':
-                        options_this = options_likert
-                        
-    # make sure last set of options is included
-    options_all.append(options_this) 
+# optionsType 'Likert' returns the Likert scale for every question's options.
+# Parsed files are cached in <filename>.cache.json (see QuestionBank.py).
+def ParseQuestionFile(filename,optionsType=None):
+    (questions_all,options_all,answers_all,_,_) = QuestionBank.ParseQuestionFile(filename,optionsType)
     # return results
     return (questions_all,options_all,answers_all)
 
 # --- PARSE PROMPT FILE INTO TOP AND BOTTOM PROMPTS --- #
 # Each top prompt should be preceded by a +. Each bottom prompt should be preceded by a -. Everything else will be ignored.
+# Parsed files are cached in <filename>.cache.json (see QuestionBank.py).
 def ParsePromptFile(filename): 
-    # initialize
-    topPrompts = []
-    bottomPrompts = []
-        
-    # parse questions & answers
-    with open(filename) as f:
-        for line in f:
-            # remove the newline character at the end of the line
-            line = line.replace('\n','')
-            # replace any newline strings with newline characters
-            line = line.replace('\\n','\n')
-            # pass to proper output
-            if line.startswith("-"): # bottom prompt
-                bottomPrompts.append(line[1:]) # omit leading -
-            elif line.startswith("+"): # top prompt
-                topPrompts.append(line[1:]) # omit leading +
-                # if it's not the first question, add the options to the list.
-                        
-    # return results
-    return (topPrompts,bottomPrompts)
+    return QuestionBank.ParsePromptFile(filename)
+
+# --- PRE-RENDERED PROMPT PAGES --- #
+# Laying out and rasterizing a TextStim's text is slow for long prompts at high resolution. A PromptDeck renders each
+# top/bottom prompt pair to a single texture (a BufferImageStim) once, so that showing a page (or returning to it
+# with the back key) just draws that texture. Identical pages share a texture.
+# Render() must be called from the thread that owns the window's OpenGL context, so call it during setup
+# (e.g. right after making message1 and message2) rather than in a background thread.
+# Usage:
+#   deck = BasicPromptTools.PromptDeck(win,message1,message2,topPrompts,bottomPrompts)
+#   deck.Render() # optional: otherwise each page is rendered the first time it's shown
+#   BasicPromptTools.RunPrompts(topPrompts,bottomPrompts,win,message1,message2,deck=deck)
+class PromptDeck(object):
+    # rect is the part of the window to capture, in norm units (default: the whole window).
+    def __init__(self,win,message1,message2,topPrompts,bottomPrompts,rect=None):
+        self.win = win
+        self.message1 = message1
+        self.message2 = message2
+        self.topPrompts = topPrompts
+        self.bottomPrompts = bottomPrompts
+        self.rect = rect
+        self.pages = {} # (topPrompt,bottomPrompt) -> BufferImageStim
+
+    def __len__(self):
+        return len(self.topPrompts)
+
+    # Render the given pages (default: all of them) that haven't been rendered yet.
+    def Render(self,iPrompts=None):
+        # import visual package (here so it doesn't interfere with the parent script's GUI)
+        from psychopy import visual
+        if iPrompts is None:
+            iPrompts = range(len(self.topPrompts))
+        for iPrompt in iPrompts:
+            key = (self.topPrompts[iPrompt],self.bottomPrompts[iPrompt])
+            if key in self.pages:
+                continue
+            self.message1.setText(key[0])
+            self.message2.setText(key[1])
+            if self.rect is None:
+                self.pages[key] = visual.BufferImageStim(self.win,stim=[self.message1,self.message2],name='PromptPage%d'%(iPrompt+1),autoLog=False)
+            else:
+                self.pages[key] = visual.BufferImageStim(self.win,stim=[self.message1,self.message2],rect=self.rect,name='PromptPage%d'%(iPrompt+1),autoLog=False)
+            self.win.clearBuffer() # don't leave the text in the back buffer
+
+    # Draw a page to the back buffer (rendering it first if needed).
+    def Draw(self,iPrompt):
+        key = (self.topPrompts[iPrompt],self.bottomPrompts[iPrompt])
+        if key not in self.pages:
+            self.Render([iPrompt])
+        self.pages[key].draw()
+
 
 # Display prompts and let the subject page through them one by one.
-def RunPrompts(topPrompts,bottomPrompts,win,message1,message2,backKey='backspace',backPrompt=0,name='Instructions',ignoreKeys=[]):
+# If deck is a PromptDeck of these prompts, its pre-rendered pages are drawn instead of message1 and message2.
+def RunPrompts(topPrompts,bottomPrompts,win,message1,message2,backKey='backspace',backPrompt=0,name='Instructions',ignoreKeys=[],deck=None):
     iPrompt = 0
     redraw = True # redraw a new prompt?
     while iPrompt < len(topPrompts):
         if redraw:
-            message1.setText(topPrompts[iPrompt])
-            message2.setText(bottomPrompts[iPrompt])
-            #display instructions and wait
-            message1.draw()
-            message2.draw()
+            if deck is not None:
+                deck.Draw(iPrompt)
+            else:
+                message1.setText(topPrompts[iPrompt])
+                message2.setText(bottomPrompts[iPrompt])
+                #display instructions and wait
+                message1.draw()
+                message2.draw()
             win.logOnFlip(level=logging.EXP, msg='Display %s%d'%(name,iPrompt+1))
             win.flip()
         #check for a keypress
@@ -106,6 +115,33 @@ def RunPrompts(topPrompts,bottomPrompts,win,message1,message2,backKey='backspace
             redraw = True
 
 
+# --- WAIT FOR KEYS WITHOUT SPINNING --- #
+# Calling event.getKeys in a tight loop keeps a CPU core busy for as long as a question is up. WaitForKeys instead
+# blocks until the OS delivers an input event to the (pyglet) window, or maxWait seconds pass, then returns what
+# event.getKeys would. PsychoPy stamps each key when its event is dispatched, which now happens as soon as it arrives,
+# so RTs are as precise as with polling. Other window types just sleep for 1 ms between checks.
+maxBlockTime = 0.1 # most time to block at once, so timeouts are still checked often
+useEventLoop = True # set to False if pyglet's event loop can't be used
+def WaitForKeys(win,keyList=None,timeStamped=False,maxWait=float('inf')):
+    global useEventLoop
+    keys = event.getKeys(keyList=keyList,timeStamped=timeStamped)
+    if keys or maxWait<=0:
+        return keys
+    timeout = min(maxWait,maxBlockTime)
+    isBlocked = False
+    if useEventLoop and getattr(win,'winType',None)=='pyglet':
+        try:
+            import pyglet
+            pyglet.app.platform_event_loop.step(timeout) # returns when an event arrives (or after timeout)
+            isBlocked = True
+        except Exception:
+            logging.warning('WaitForKeys: could not wait on the pyglet event loop, sleeping between checks instead.')
+            useEventLoop = False
+    if not isBlocked:
+        time.sleep(min(timeout,0.001))
+    return event.getKeys(keyList=keyList,timeStamped=timeStamped)
+
+
 # Display questions and let user select each one's answer with a single keypress.
 def RunQuestions(question_list,options_list,win,message1,message2, name='Question', questionDur=float('inf'), isEndedByKeypress=True,respKeys=['1','2','3','4']):
     # set up
@@ -139,7 +175,7 @@ def RunQuestions(question_list,options_list,win,message1,message2, name='Questio
         # Wait for keypress
         endQuestion = False;
         while (trialClock.getTime()<questionDur and not endQuestion):
-            newKeys = event.getKeys(keyList=(respKeys + ['q','escape','backspace','period']),timeStamped=trialClock)
+            newKeys = WaitForKeys(win,keyList=(respKeys + ['q','escape','backspace','period']),timeStamped=trialClock,maxWait=questionDur-trialClock.getTime())
             for newKey in newKeys:
                 # check for quit keys
                 if newKey[0] in ['q', 'escape']:
@@ -176,11 +212,23 @@ def RunQuestions_Move(question_list,options_list, win, name='Question', question
     iQ = 0
     iA = 0
     respKeys=[upKey,downKey,selectKey]
-    # make visuals
+    # make visuals: each option has a normal and a bold stim, both set once per question, 
+    # so moving the selection just changes which one is drawn (changing .bold re-renders the text).
     questionText = visual.TextStim(win, pos=[0,+.5], wrapWidth=1.5, color='#000000', alignHoriz='center', name='questionText', text="aaa",units='norm')
     optionsText = []
-    for iResp in range(0,len(options_list[0])):
+    optionsText_bold = []
+    for iResp in range(0,max([len(options) for options in options_list])):
         optionsText.append(visual.TextStim(win, pos=[0,-.1*iResp], wrapWidth=1.5, color='#000000', alignHoriz='center', name='option%d'%(iResp+1), text="aaa",units='norm',autoLog=False))
+        optionsText_bold.append(visual.TextStim(win, pos=[0,-.1*iResp], wrapWidth=1.5, color='#000000', alignHoriz='center', name='option%d_bold'%(iResp+1), text="aaa",units='norm',bold=True,autoLog=False))
+    
+    # draw the question with the currently selected answer in bold
+    def DrawQuestion(iQ,iA):
+        questionText.draw()
+        for iResp in range(0,len(options_list[iQ])):
+            if iResp == iA:
+                optionsText_bold[iResp].draw()
+            else:
+                optionsText[iResp].draw()
     
     while iQ < nQuestions:
         print('iQ = %d/%d'%(iQ+1,nQuestions))
@@ -188,11 +236,10 @@ def RunQuestions_Move(question_list,options_list, win, name='Question', question
         iA = int((len(options_list[iQ])-1)*0.5)
         # set and draw text
         questionText.setText(question_list[iQ])
-        questionText.draw()
-        optionsText[iA].bold = True # make currently selected answer bold
         for iResp in range(0,len(options_list[iQ])):
             optionsText[iResp].setText('%d) %s'%((iResp+1),options_list[iQ][iResp]))
-            optionsText[iResp].draw()
+            optionsText_bold[iResp].setText('%d) %s'%((iResp+1),options_list[iQ][iResp]))
+        DrawQuestion(iQ,iA)
                 
         # Flush the key buffer and mouse movements
         event.clearEvents()
@@ -204,7 +251,7 @@ def RunQuestions_Move(question_list,options_list, win, name='Question', question
         # Wait for keypress
         endQuestion = False;
         while (trialClock.getTime()<questionDur and not endQuestion):
-            newKeys = event.getKeys(keyList=(respKeys + ['q','escape','backspace','period']),timeStamped=trialClock)
+            newKeys = WaitForKeys(win,keyList=(respKeys + ['q','escape','backspace','period']),timeStamped=trialClock,maxWait=questionDur-trialClock.getTime())
             for newKey in newKeys:
                 # check for quit keys
                 if newKey[0] in ['q', 'escape']:
@@ -217,39 +264,19 @@ def RunQuestions_Move(question_list,options_list, win, name='Question', question
                     iQ +=1 # skip fwd without recording response
                     endQuestion = True;
                 elif newKey[0] == upKey: # move response up
-                    # remove old bold
-                    optionsText[iA].bold = False
-                    # update answer
-                    iA -= 1
-                    if iA<0:
-                        iA=0
-                    # make newly selected answer bold
-                    optionsText[iA].bold = True
+                    iA = max(0,iA-1)
                     # redraw everything
-                    questionText.draw()
-                    for iResp in range(0,len(options_list[iQ])):
-                        optionsText[iResp].draw()
+                    DrawQuestion(iQ,iA)
                     win.flip()
                 elif newKey[0] == downKey: # move response down
-                    # remove old bold
-                    optionsText[iA].bold = False
-                    # update answer
-                    iA += 1
-                    if iA>=len(options_list[iQ]):
-                        iA = len(options_list[iQ])-1
-                    # make newly selected answer bold
-                    optionsText[iA].bold = True
+                    iA = min(len(options_list[iQ])-1,iA+1)
                     # redraw everything
-                    questionText.draw()
-                    for iResp in range(0,len(options_list[iQ])):
-                        optionsText[iResp].draw()
+                    DrawQuestion(iQ,iA)
                     win.flip()
                 elif newKey[0] == selectKey:
                     # log response
                     allKeys[iQ] = (iA+1, newKey[1]) # make new tuple with answer index and response time
                     logging.log(level=logging.EXP, msg= 'Responded %d'%(iA+1))
-                    # remove old bold
-                    optionsText[iA].bold = False
                     # advance question index
                     iQ +=1
                     if isEndedByKeypress:
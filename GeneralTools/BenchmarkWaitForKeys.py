@@ -0,0 +1,57 @@
+#!/usr/bin/env python2
+"""Compare the CPU use of polling event.getKeys with BasicPromptTools.WaitForKeys while waiting for a response."""
+# BenchmarkWaitForKeys.py
+# Created 10/16/26 by DJ.
+#
+# Opens a small window and waits for a response for --duration seconds, first by calling event.getKeys in a
+# tight loop (as RunQuestions used to), then with WaitForKeys. Prints the CPU time used as a % of one core,
+# and the RT of any key pressed (press a key mid-wait to compare the timestamps of the two methods).
+# Usage:
+#   python BenchmarkWaitForKeys.py --duration 10
+
+from psychopy import visual, core, event
+import BasicPromptTools
+import os # for CPU times
+import argparse # for command-line arguments
+
+
+# --- WAIT FOR A RESPONSE WITH ONE METHOD & MEASURE CPU USE --- #
+def TimeResponseLoop(win,method,duration,keyList):
+    event.clearEvents()
+    trialClock = core.Clock()
+    cpuStart = sum(os.times()[:2]) # user + system time
+    newKeys = []
+    while trialClock.getTime()<duration and not newKeys:
+        if method == 'poll':
+            newKeys = event.getKeys(keyList=keyList,timeStamped=trialClock)
+        else:
+            newKeys = BasicPromptTools.WaitForKeys(win,keyList=keyList,timeStamped=trialClock,maxWait=duration-trialClock.getTime())
+    tElapsed = trialClock.getTime()
+    cpuPercent = (sum(os.times()[:2])-cpuStart)/tElapsed*100
+    return cpuPercent, tElapsed, newKeys
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Compare the CPU use of polling getKeys and WaitForKeys.')
+parser.add_argument('--duration', type=float, default=10, help='seconds to wait with each method')
+parser.add_argument('--winType', default='pyglet', help='PsychoPy window type')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    win = visual.Window([400,300], winType=args.winType, units='norm', color='#FFFFFF')
+    message = visual.TextStim(win, color='#000000', text='')
+    try:
+        for method in ['poll','wait']:
+            message.setText('Waiting for a response (%s)...\nPress 1-4 to stop early.'%method)
+            message.draw()
+            win.flip()
+            cpuPercent, tElapsed, newKeys = TimeResponseLoop(win,method,args.duration,['1','2','3','4'])
+            print('=== %s: %.1f%% CPU over %.1f s, keys = %s'%(method,cpuPercent,tElapsed,newKeys))
+    finally:
+        win.close()
+        core.quit()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python2
+"""Index PsychoPy logs' parameters and run/group/block markers in an SQLite file for fast queries."""
+# LogIndex.py
+# Created 10/16/26 by DJ.
+#
+# IndexLogs reads each log once (with LogTools.ReadLog) and stores its parameter block and the byte offsets
+# of its '===== START RUN', '==== START GROUP' and '=== START BLOCK' markers (and their END markers).
+# Logs whose size and modification time haven't changed since they were indexed are skipped.
+# Questions like "which sessions used moodQuestionFile2 X" or "give me run 3 of subject Y" are then answered
+# from the index, seeking straight to the right part of the log instead of reparsing it.
+# Usage:
+#   LogIndex.IndexLogs(glob('Data/Raw/*.log'),'Data/LogIndex.sqlite')
+#   logFiles = LogIndex.FindLogs('Data/LogIndex.sqlite',moodQuestionFile2='Questions/ERVasRatingScales.txt')
+#   events = LogIndex.ReadMarkedSection('Data/LogIndex.sqlite',logFiles[0],'RUN',3)
+# Or from the command line:
+#   python LogIndex.py Data/LogIndex.sqlite --index Data/Raw/*.log --find subject=1234
+
+import LogTools # for reading the logs
+import sqlite3 # for the index
+import json # for storing parameter values
+import os # for paths and file info
+import argparse # for command-line arguments
+
+
+# --- OPEN (AND SET UP) THE INDEX --- #
+def OpenIndex(indexFile):
+    con = sqlite3.connect(indexFile,timeout=60)
+    with con:
+        con.execute('CREATE TABLE IF NOT EXISTS logs (logFile TEXT PRIMARY KEY, size INTEGER, mtime REAL)')
+        con.execute('CREATE TABLE IF NOT EXISTS params (logFile TEXT, name TEXT, value TEXT, PRIMARY KEY (logFile, name))')
+        con.execute('CREATE INDEX IF NOT EXISTS paramValues ON params (name, value)')
+        con.execute('CREATE TABLE IF NOT EXISTS markers (logFile TEXT, kind TEXT, number INTEGER, t REAL, '
+                    'startOffset INTEGER, endOffset INTEGER, PRIMARY KEY (logFile, kind, number))')
+    return con
+
+
+# --- CONVERT PATHS & VALUES TO/FROM THEIR FORM IN THE INDEX --- #
+# Logs are stored relative to the index's folder, so the index still works if the data folder is mounted elsewhere.
+def GetIndexPath(indexFile,logFile):
+    return os.path.relpath(os.path.abspath(logFile),os.path.dirname(os.path.abspath(indexFile))).replace(os.sep,'/')
+
+def GetLogPath(indexFile,indexPath):
+    return os.path.join(os.path.dirname(os.path.abspath(indexFile)),*indexPath.split('/'))
+
+# Parameter values are stored as JSON. Numbers in logs are always read as floats, so ints are matched as floats.
+def ToIndexValue(value):
+    if isinstance(value,bool):
+        value = str(value)
+    elif isinstance(value,int):
+        value = float(value)
+    return json.dumps(value)
+
+
+# --- ADD LOGS TO THE INDEX --- #
+# Returns the number of logs that were (re)indexed.
+def IndexLogs(logFiles,indexFile,force=False):
+    con = OpenIndex(indexFile)
+    nIndexed = 0
+    try:
+        for logFile in logFiles:
+            indexPath = GetIndexPath(indexFile,logFile)
+            logStat = os.stat(logFile)
+            # skip logs that haven't changed
+            if not force:
+                row = con.execute('SELECT size, mtime FROM logs WHERE logFile=?',(indexPath,)).fetchone()
+                if row is not None and row[0]==logStat.st_size and row[1]==logStat.st_mtime:
+                    continue
+            print('Indexing %s...'%logFile)
+
+            # read parameters and markers
+            params = {}
+            markers = [] # [kind, number, t, startOffset, endOffset]
+            iOpen = {} # index in markers of the open marker of each kind
+            nMarkers = {} # number of markers of each kind so far
+            for event in LogTools.ReadLog(logFile,kinds=['Params','Message'],prefixes=['===']):
+                if event.kind=='Params':
+                    params = event.value
+                    continue
+                words = event.msg.split()
+                if len(words)<3 or words[1] not in ['START','END']:
+                    continue
+                kind = words[2]
+                if words[1]=='START':
+                    nMarkers[kind] = nMarkers.get(kind,0)+1
+                    iOpen[kind] = len(markers)
+                    markers.append([kind,nMarkers[kind],event.t,event.offset,None])
+                elif kind in iOpen: # END: the section includes the END marker's entry
+                    markers[iOpen.pop(kind)][4] = event.offset
+            # sections that never ended run to the end of the file
+            for marker in markers:
+                if marker[4] is None:
+                    marker[4] = logStat.st_size
+
+            # replace the log's old entries
+            with con:
+                for table in ['logs','params','markers']:
+                    con.execute('DELETE FROM %s WHERE logFile=?'%table,(indexPath,))
+                con.execute('INSERT INTO logs VALUES (?,?,?)',(indexPath,logStat.st_size,logStat.st_mtime))
+                con.executemany('INSERT INTO params VALUES (?,?,?)',[(indexPath,name,ToIndexValue(value)) for name,value in params.items()])
+                con.executemany('INSERT INTO markers VALUES (?,?,?,?,?,?)',[[indexPath]+marker for marker in markers])
+            nIndexed += 1
+    finally:
+        con.close()
+    print('Indexed %d of %d logs.'%(nIndexed,len(logFiles)))
+    return nIndexed
+
+
+# --- FIND LOGS WITH GIVEN PARAMETER VALUES --- #
+# e.g. FindLogs(indexFile, subject=1234, moodQuestionFile2='Questions/ERVasRatingScales.txt')
+def FindLogs(indexFile,**paramValues):
+    con = OpenIndex(indexFile)
+    try:
+        sql = 'SELECT logFile FROM logs'
+        args = []
+        for name in sorted(paramValues.keys()):
+            sql += ' WHERE' if not args else ' AND'
+            sql += ' logFile IN (SELECT logFile FROM params WHERE name=? AND value=?)'
+            args += [name,ToIndexValue(paramValues[name])]
+        return [GetLogPath(indexFile,row[0]) for row in con.execute(sql+' ORDER BY logFile',args)]
+    finally:
+        con.close()
+
+
+# --- GET A LOG'S PARAMETERS FROM THE INDEX --- #
+def GetIndexedParams(indexFile,logFile):
+    con = OpenIndex(indexFile)
+    try:
+        rows = con.execute('SELECT name, value FROM params WHERE logFile=?',(GetIndexPath(indexFile,logFile),))
+        return dict([(name,json.loads(value)) for name,value in rows])
+    finally:
+        con.close()
+
+
+# --- GET THE BYTE OFFSETS OF A RUN, GROUP OR BLOCK --- #
+# kind is 'RUN', 'GROUP' or 'BLOCK', number is 1-based (counted from the start of the log).
+# Returns (t, startOffset, endOffset), or None if the log doesn't have that marker.
+def GetMarker(indexFile,logFile,kind,number):
+    con = OpenIndex(indexFile)
+    try:
+        return con.execute('SELECT t, startOffset, endOffset FROM markers WHERE logFile=? AND kind=? AND number=?',
+            (GetIndexPath(indexFile,logFile),kind,number)).fetchone()
+    finally:
+        con.close()
+
+
+# --- READ ONE RUN, GROUP OR BLOCK OF A LOG --- #
+# Returns a generator of LogTools.LogEvents. Any extra inputs are passed to LogTools.ReadLog.
+def ReadMarkedSection(indexFile,logFile,kind,number,**readLogArgs):
+    marker = GetMarker(indexFile,logFile,kind,number)
+    if marker is None:
+        raise ValueError('%s %d of %s is not in index %s.'%(kind,number,logFile,indexFile))
+    return LogTools.ReadLog(logFile,startOffset=marker[1],endOffset=marker[2],**readLogArgs)
+
+
+# %% === Set up argument parser ===
+
+parser = argparse.ArgumentParser(description='Index PsychoPy logs, or find logs in the index by parameter value.')
+parser.add_argument('indexFile', help='SQLite index file')
+parser.add_argument('--index', nargs='*', default=[], help='log files to add to the index')
+parser.add_argument('--force', action='store_true', help='reindex logs even if they have not changed')
+parser.add_argument('--find', nargs='*', default=[], help='name=value parameter pairs that logs must match')
+
+
+# ==== Declare main command-line function ==== #
+
+if __name__ == '__main__':
+
+    args = parser.parse_args();
+    if args.index:
+        IndexLogs(args.index,args.indexFile,args.force)
+    if args.find:
+        paramValues = {}
+        for pair in args.find:
+            name,value = pair.split('=',1)
+            try:
+                paramValues[name] = float(value) # numbers are logged as floats
+            except ValueError:
+                paramValues[name] = value
+        for logFile in FindLogs(args.indexFile,**paramValues):
+            print(logFile)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python2
+"""Stream events from PsychoPy log files."""
+# LogTools.py
+# Created 10/16/26 by DJ based on ImportExtinctionRecallTaskLog.py
+# Updated 10/16/26 by DJ - added startOffset and endOffset inputs to ReadLog (for LogIndex.py)
+# Updated 10/16/26 by DJ - ReadLog filters on kinds before building the event (GetLogKind), like levels and prefixes.
+#
+# Every task logs through logging.LogFile, which writes one '<time> \t<LEVEL> \t<message>' entry per line
+# (plus continuation lines if a message contains newlines). ReadLog reads the file one line at a time,
+# so memory use stays constant however big the log is, and yields a LogEvent for each entry:
+#  - kind 'Params': the whole ---START PARAMETERS--- block, with value = {paramName: value}
+#  - kind 'Keypress': 'Keypress: <key>' -> name = key
+#  - kind 'Display': 'Display <stim> [<info>]' -> name = stim, value = info (or None)
+#  - kind 'RatingScale': 'RatingScale <scale>: <result>' -> name = scale, value = result (e.g. 'rating=50')
+#  - kind 'SetPort': 'set port <address> to <data>' -> name = address, value = data (float)
+#  - kind 'Message': anything else -> value = message
+# Usage:
+#   for event in LogTools.ReadLog('SampleExperiment_d1.py-1-1-Nov_09_1235.log', kinds=['Keypress']):
+#       print(event.t, event.name)
+
+import ast # for parameter parsing
+from collections import namedtuple
+
+# offset is the byte offset of the entry's first line in the file, msg the full message text.
+LogEvent = namedtuple('LogEvent',['t','level','kind','name','value','offset','msg'])
+
+
+# --- PARSE ONE PARAMETER LINE INTO A DICT --- #
+# Numbers become floats, lists become lists, anything else stays a string (as ImportExtinctionRecallTaskLog always did).
+def ParseParamMessage(msg,params):
+    words = msg.split()
+    key = words[0][:-1] # name of parameter (without the colon)
+    if len(words)==2:
+        try:
+            params[key] = float(words[1]) # if it's a number, convert to a float
+        except ValueError:
+            params[key] = words[1] # otherwise, record the string
+    elif len(words)<2:
+        params[key] = ''
+    elif words[1].startswith("["):
+        params[key] = ast.literal_eval(''.join(words[1:])) # if the parameter is a list, make it a list variable
+    else:
+        params[key] = ' '.join(words[1:])
+    return params
+
+
+# --- CLASSIFY ONE LOG ENTRY --- #
+# The kind of event a message makes, from its start alone (so ReadLog can filter by kind before parsing it).
+# Must match MakeLogEvent.
+logKindPrefixes = [('Keypress:','Keypress'), ('Display ','Display'), ('RatingScale ','RatingScale'), ('set port ','SetPort')]
+def GetLogKind(msg):
+    for prefix,kind in logKindPrefixes:
+        if msg.startswith(prefix):
+            return kind
+    return 'Message'
+
+def MakeLogEvent(t,level,msg,offset):
+    if msg.startswith('Keypress:'):
+        words = msg.split()
+        return LogEvent(t,level,'Keypress',words[1] if len(words)>1 else '',None,offset,msg)
+    elif msg.startswith('Display '):
+        words = msg.split(None,2)
+        return LogEvent(t,level,'Display',words[1],words[2] if len(words)>2 else None,offset,msg)
+    elif msg.startswith('RatingScale '):
+        words = msg.split(None,2)
+        return LogEvent(t,level,'RatingScale',words[1].rstrip(':'),words[2] if len(words)>2 else '',offset,msg)
+    elif msg.startswith('set port '):
+        words = msg.split()
+        try:
+            value = float(words[-1])
+        except ValueError:
+            value = words[-1]
+        return LogEvent(t,level,'SetPort',words[2],value,offset,msg)
+    else:
+        return LogEvent(t,level,'Message',None,msg,offset,msg)
+
+
+# --- STREAM EVENTS FROM A LOG FILE --- #
+# levels: only yield entries with these levels (e.g. ['DATA','EXP']). None = all.
+# kinds: only yield events of these kinds (e.g. ['Keypress','Display']). None = all.
+# prefixes: only yield entries whose message starts with one of these strings. None = all.
+#   (the parameter block is still yielded if 'Params' is in kinds, or kinds is None and no prefixes are given)
+# Filters are applied before a message is parsed, so unwanted entries cost little more than reading the line.
+# startOffset, endOffset: only read the entries starting between these byte offsets (inclusive), e.g. one run
+#   found with LogIndex.py. startOffset must be the start of an entry.
+def ReadLog(logFile,levels=None,kinds=None,prefixes=None,startOffset=0,endOffset=None):
+    # set up filters
+    if levels is not None:
+        levels = set(levels)
+    if kinds is not None:
+        kinds = set(kinds)
+    if prefixes is not None:
+        prefixes = tuple(prefixes)
+    wantParams = ('Params' in kinds) if (kinds is not None) else (prefixes is None)
+
+    params = None # parameters being read in, if in the parameter block
+    # entry being read (it may have continuation lines, so it's only yielded when the next one starts)
+    pending = None # (t, level, msg, offset)
+    extraLines = [] # continuation lines of the pending entry
+    offset = startOffset
+    with open(logFile,'rb') as f:
+        f.seek(startOffset)
+        for rawLine in f:
+            lineOffset = offset
+            offset += len(rawLine)
+            line = rawLine.decode('utf-8','replace').rstrip('\r\n')
+            # Is this the start of a new entry?
+            parts = line.split('\t',2)
+            try:
+                t = float(parts[0])
+                isEntry = len(parts)==3
+            except ValueError:
+                isEntry = False
+            if not isEntry: # continuation of the last message
+                if pending is not None:
+                    extraLines.append(line)
+                continue
+
+            # finish the previous entry
+            if pending is not None:
+                if extraLines:
+                    pending = (pending[0],pending[1],'\n'.join([pending[2]]+extraLines),pending[3])
+                    extraLines = []
+                yield MakeLogEvent(*pending)
+                pending = None
+            if endOffset is not None and lineOffset>endOffset:
+                break
+
+            level = parts[1].strip()
+            msg = parts[2]
+            # Handle the parameter block
+            if 'START PARAMETERS' in msg:
+                params = {}
+                paramsOffset = lineOffset
+                continue
+            elif 'END PARAMETERS' in msg:
+                if wantParams and params is not None and (levels is None or level in levels):
+                    yield LogEvent(t,level,'Params',None,params,paramsOffset,msg)
+                params = None
+                continue
+            elif params is not None:
+                if wantParams:
+                    ParseParamMessage(msg,params)
+                continue
+
+            # Filter the entry
+            if levels is not None and level not in levels:
+                continue
+            if prefixes is not None and not msg.startswith(prefixes):
+                continue
+            if kinds is not None and GetLogKind(msg) not in kinds:
+                continue
+            pending = (t,level,msg,lineOffset)
+
+        # finish the last entry
+        if pending is not None:
+            if extraLines:
+                pending = (pending[0],pending[1],'\n'.join([pending[2]]+extraLines),pending[3])
+            yield MakeLogEvent(*pending)
+
+
+# --- GET A LOG'S PARAMETERS --- #
+# Stops reading as soon as the parameter block ends. Returns {} if there is no parameter block.
+def GetLogParams(logFile):
+    for event in ReadLog(logFile,kinds=['Params']):
+        return event.value
+    return {}
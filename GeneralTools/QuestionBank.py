@@ -0,0 +1,187 @@
+#!/usr/bin/env python2
+"""Parse question and prompt files, caching the results in a compiled JSON file next to each one."""
+# QuestionBank.py
+# Created 10/16/26 by DJ based on the ParseQuestionFile and ParsePromptFile functions in PromptTools.py.
+#
+# Question/prompt files are parsed line by line: '?' starts a question, '-' and '+' are options ('+' is the
+# correct answer) or bottom and top prompts, and '#' lines are headers (e.g. '# PAGE 3, TIME 1:25').
+# The first time a file is loaded, it's compiled into <filename>.cache.json, which holds every result the
+# parsers can return (questions, options, answers, pages, times, Likert options & answers, top & bottom prompts).
+# After that, loading is a single read of the cache. The cache is rebuilt if the file's contents (checked by
+# hash when its size or modification time change) no longer match. If the cache can't be written (e.g. a
+# read-only folder), the file is just parsed.
+# Usage:
+#   questions,options,answers = QuestionBank.ParseQuestionFile('Questions/ERVasRatingScales.txt')
+#   topPrompts,bottomPrompts = QuestionBank.ParsePromptFile('Prompts/ERPrompts.txt')
+
+import json # for the compiled cache
+import hashlib # for detecting changed files
+import os # for file info
+
+cacheVersion = 1 # increment if the compiled format changes
+likertOptions = ['Strongly agree','Agree','Neutral','Disagree','Strongly disagree']
+
+
+# --- PARSE LINES OF A QUESTION FILE --- #
+# optionsType 'Likert' returns the Likert scale (plus any options in the file) for every question's options.
+# Returns (questions,options,answers,pages,times)
+def ParseQuestionLines(lines,optionsType=None):
+    # initialize
+    questions_all = []
+    answers_all = []
+    options_all = []
+    pages_all = []
+    times_all = []
+    if optionsType is None:
+        options_this = []
+    elif optionsType == 'Likert':
+        options_likert = list(likertOptions)
+        options_this = options_likert
+
+    # parse questions & answers
+    for line in lines:
+        # remove the newline character at the end of the line
+        line = line.replace('\n','')
+        # replace any newline strings with newline characters
+        line = line.replace('\\n','\n')
+        # pass to proper output
+        if line.startswith("-"): # incorrect answer
+            options_this.append(line[1:]) # omit leading -
+        elif line.startswith("+"): # correct answer
+            options_this.append(line[1:]) # omit leading +
+            answers_all.append(len(options_this))
+        elif line.startswith("?"): # question
+            questions_all.append(line[1:]) # omit leading ?
+            # if it's not the first question, add the options to the list.
+            if options_this:
+                options_all.append(options_this)
+                if optionsType is None:
+                    options_this = [] #reset
+                elif optionsType == 'Likert':
+                    options_this = options_likert
+        elif line.startswith("#"): # question header
+            pieces = line.split(',')
+            for piece in pieces:
+                nameval = piece.split() # split at space
+                if len(nameval)<2:
+                    continue
+                if nameval[0] == 'PAGE':
+                    pages_all.append(nameval[1])
+                elif nameval[0] == 'TIME':
+                    minsec = nameval[1].split(':')
+                    try:
+                        times_this = int(minsec[0])*60+int(minsec[1])
+                    except (ValueError,IndexError): # not a m:ss time (e.g. a prompt that says 'TIME permitting')
+                        continue
+                    times_all.append(times_this)
+
+    # make sure last set of options is included
+    options_all.append(options_this)
+    return (questions_all,options_all,answers_all,pages_all,times_all)
+
+
+# --- PARSE LINES OF A PROMPT FILE --- #
+# Each top prompt should be preceded by a +. Each bottom prompt should be preceded by a -. Everything else will be ignored.
+def ParsePromptLines(lines):
+    # initialize
+    topPrompts = []
+    bottomPrompts = []
+
+    for line in lines:
+        # remove the newline character at the end of the line
+        line = line.replace('\n','')
+        # replace any newline strings with newline characters
+        line = line.replace('\\n','\n')
+        # pass to proper output
+        if line.startswith("-"): # bottom prompt
+            bottomPrompts.append(line[1:]) # omit leading -
+        elif line.startswith("+"): # top prompt
+            topPrompts.append(line[1:]) # omit leading +
+
+    return (topPrompts,bottomPrompts)
+
+
+# --- COMPILE A FILE INTO EVERYTHING THE PARSERS RETURN --- #
+def CompileLines(lines):
+    questions,options,answers,pages,times = ParseQuestionLines(lines)
+    _,likertOptions_all,likertAnswers,_,_ = ParseQuestionLines(lines,optionsType='Likert')
+    topPrompts,bottomPrompts = ParsePromptLines(lines)
+    return {'questions':questions, 'options':options, 'answers':answers, 'pages':pages, 'times':times,
+            'likertOptions':likertOptions_all, 'likertAnswers':likertAnswers,
+            'topPrompts':topPrompts, 'bottomPrompts':bottomPrompts}
+
+
+# --- LOAD A FILE'S COMPILED CONTENTS, (RE)BUILDING THE CACHE IF NEEDED --- #
+def GetCacheFile(filename):
+    return filename + '.cache.json'
+
+# json loads text as unicode. In Python 2, turn it back into (utf-8) str, as the parsers return when reading the file.
+def FromJson(obj):
+    try:
+        unicodeType = unicode
+    except NameError: # Python 3: strings are already what the parsers return
+        return obj
+    if isinstance(obj,unicodeType):
+        return obj.encode('utf-8')
+    elif isinstance(obj,list):
+        return [FromJson(item) for item in obj]
+    elif isinstance(obj,dict):
+        return dict([(FromJson(key),FromJson(value)) for key,value in obj.items()])
+    return obj
+
+def LoadCompiledFile(filename):
+    cacheFile = GetCacheFile(filename)
+    fileStat = os.stat(filename)
+    # read the cache
+    try:
+        with open(cacheFile) as f:
+            cache = json.load(f)
+        if cache['version']!=cacheVersion:
+            cache = None
+    except (IOError,OSError,ValueError,KeyError):
+        cache = None
+    # if the file's size and modification time haven't changed, the cache is up to date
+    if cache is not None and cache['size']==fileStat.st_size and cache['mtime']==fileStat.st_mtime:
+        return FromJson(cache['contents'])
+
+    # otherwise check the file's contents
+    with open(filename,'rb') as f:
+        rawContents = f.read()
+    fileHash = hashlib.sha1(rawContents).hexdigest()
+    if cache is None or cache['sha1']!=fileHash:
+        with open(filename) as f: # read as text, as the parsers always have
+            contents = CompileLines(f.readlines())
+    else:
+        contents = FromJson(cache['contents']) # same contents, new modification time (e.g. copied)
+    # save the cache
+    cache = {'version':cacheVersion, 'size':fileStat.st_size, 'mtime':fileStat.st_mtime, 'sha1':fileHash, 'contents':contents}
+    tempFile = '%s.%d.tmp'%(cacheFile,os.getpid())
+    try:
+        with open(tempFile,'w') as f:
+            json.dump(cache,f)
+        if os.path.exists(cacheFile):
+            os.remove(cacheFile) # os.rename won't overwrite on Windows
+        os.rename(tempFile,cacheFile)
+    except (IOError,OSError,ValueError): # can't write here (or, in Python 2, the file isn't utf-8): just use the parsed contents
+        try:
+            if os.path.exists(tempFile):
+                os.remove(tempFile) # don't leave a partial cache next to the file
+        except OSError:
+            pass
+    return contents
+
+
+# --- PARSE QUESTION FILE INTO QUESTIONS AND OPTIONS --- #
+# Returns (questions,options,answers,pages,times), as PromptTools.ParseQuestionFile(...,returnTimes=True) does.
+def ParseQuestionFile(filename,optionsType=None):
+    contents = LoadCompiledFile(filename)
+    if optionsType == 'Likert':
+        return (contents['questions'],contents['likertOptions'],contents['likertAnswers'],contents['pages'],contents['times'])
+    else:
+        return (contents['questions'],contents['options'],contents['answers'],contents['pages'],contents['times'])
+
+
+# --- PARSE PROMPT FILE INTO TOP AND BOTTOM PROMPTS --- #
+def ParsePromptFile(filename):
+    contents = LoadCompiledFile(filename)
+    return (contents['topPrompts'],contents['bottomPrompts'])
@@ -11,17 +11,127 @@
 # Updated 1/10/19 by DJ - if no response, log VAS result manually
 # Updated 2/21/19 by DJ - fixed VAS bug where pos!=0 led to moving marker
 # Updated 2/25/19 by DJ - added tickHeight & tickLabelWidth, changed a couple variable names
+# Updated 10/16/26 by DJ - added VasWidget: RatingScale, marker & key handler are reused across questions and calls,
+#   held keys slide the marker at slideSpeed points/s, placed for the next flip using the measured frame period.
+# Updated 10/16/26 by DJ - VasWidget keeps a RatingScale for every layout it has shown, plus tick/label geometry;
+#   added PrepareVAS to build scales before they're needed.
+# Updated 10/16/26 by DJ - added resultFile input to ShowVAS (typed result records, see VasResults.py)
+# Updated 10/16/26 by DJ - with a resultFile, ShowVAS also records the marker position on every frame (VasResults.TrajectoryBuffer)
 
 from psychopy import core, event, logging#, visual # visual and gui conflict, so don't import it here
 import time
 import string
+import VasResults # for recording VAS trajectories
 
+# --- REUSABLE VAS WIDGET --- #
+# Making a RatingScale (and its marker & label text) takes a long time, so each window gets one VasWidget that keeps them.
+# The widget keeps a RatingScale for every layout (labels, keys, colors, positions...) it has shown. When a question 
+# has a layout that's been seen before, that scale is re-labelled and reset instead of being made again, so switching 
+# between scales (e.g. image ratings and mood VAS) costs no more than repeating one. The widget's pyglet 
+# KeyStateHandler (for press-and-hold) is only pushed onto the window once, rather than once per ShowVAS call.
+class VasWidget(object):
+    def __init__(self,win):
+        from pyglet.window import key # for press-and-hold functionality
+        self.win = win
+        self.keyState = key.KeyStateHandler()
+        win.winHandle.push_handlers(self.keyState)
+        self.markers = {} # (textColor,markerSize) -> triangle ShapeStim
+        self.labelGeometry = {} # (labels,tickHeight,tickLabelWidth,labelYPos) -> (tickMarks,tickWrapWidth)
+        self.ratingScales = {} # layout -> RatingScale
+        self.trajectory = VasResults.TrajectoryBuffer() # marker position on each frame of the current question
+
+    # Get the triangle marker for a given color & size
+    def GetMarker(self,textColor,markerSize):
+        # import packages
+        from psychopy import visual # for ShapeStim
+        import numpy as np # for vertices
+        markerKey = (str(textColor),markerSize)
+        if markerKey not in self.markers:
+            self.markers[markerKey] = visual.ShapeStim(self.win,lineColor=textColor,fillColor=textColor,vertices=((-markerSize/2.,markerSize*np.sqrt(5./4.)),(markerSize/2.,markerSize*np.sqrt(5./4.)),(0,0)),units='norm',closeShape=True,name='triangle');
+        return self.markers[markerKey]
+
+    # Get the tick locations and label wrap width for a set of labels
+    def GetLabelGeometry(self,labels,tickHeight,tickLabelWidth,labelYPos):
+        # import packages
+        import numpy as np # for tick locations
+        geometryKey = (tuple(labels),tickHeight,tickLabelWidth,labelYPos)
+        if geometryKey not in self.labelGeometry:
+            tickMarks = np.linspace(0,100,len(labels)).tolist()
+            if tickLabelWidth==0.0: # if default value, determine automatically to fit all tick mark labels
+                tickWrapWidth = (tickMarks[1]-tickMarks[0])*0.9/100 # *.9 for extra space, /100 for norm units
+            else: # use user-specified value
+                tickWrapWidth = tickLabelWidth;
+            self.labelGeometry[geometryKey] = (tickMarks,tickWrapWidth)
+        return self.labelGeometry[geometryKey]
+
+    # Get a RatingScale showing the given question & labels, ready to be drawn
+    def GetRatingScale(self, question, labels, name, questionDur, upKey, downKey, selectKey, textColor, pos, hideMouse, 
+                       scaleTextPos, labelYPos, markerSize, tickHeight, tickLabelWidth):
+        layout = (tuple(labels), upKey, downKey, selectKey, str(textColor), tuple(pos), hideMouse, tuple(scaleTextPos), labelYPos, markerSize, tickHeight, tickLabelWidth)
+        if layout in self.ratingScales:
+            # re-label the scale and reset it (without logging the reset)
+            ratingScale = self.ratingScales[layout]
+            if ratingScale.scaleDescription.text != question: # changing the text re-renders it
+                ratingScale.scaleDescription.setText(question)
+            ratingScale.name = name
+            ratingScale.maxTime = float(questionDur)
+            ratingScale.allowTimeOut = bool(ratingScale.minTime < ratingScale.maxTime) # as RatingScale's init does
+            ratingScale.timedOut = False # reset() doesn't clear this
+            ratingScale.autoLog = False
+            ratingScale.reset()
+            ratingScale.autoLog = True
+            return ratingScale
+        
+        # import packages
+        from psychopy import visual # for ratingScale
+        tickMarks,tickWrapWidth = self.GetLabelGeometry(labels,tickHeight,tickLabelWidth,labelYPos)
+        
+        ratingScale = visual.RatingScale(self.win, scale=question, \
+            low=0., high=100., markerStart=50., precision=1., labels=labels, tickMarks=tickMarks, tickHeight=tickHeight, \
+            marker=self.GetMarker(textColor,markerSize), markerColor=textColor, markerExpansion=1, singleClick=False, disappear=False, \
+            textSize=0.8, textColor=textColor, textFont='Helvetica Bold', showValue=False, \
+            showAccept=False, acceptKeys=selectKey, acceptPreText='key, click', acceptText='accept?', acceptSize=1.0, \
+            leftKeys=downKey, rightKeys=upKey, respKeys=(), lineColor=textColor, skipKeys=['q','escape'], \
+            mouseOnly=False, noMouse=hideMouse, size=2.0, stretch=1.0, pos=pos, minTime=0.4, maxTime=questionDur, \
+            flipVert=False, depth=0, name=name, autoLog=True)
+        # Fix text wrapWidth
+        for iLabel in range(len(ratingScale.labels)):
+            ratingScale.labels[iLabel].wrapWidth = tickWrapWidth
+            ratingScale.labels[iLabel].pos  = (ratingScale.labels[iLabel].pos[0],labelYPos)
+            ratingScale.labels[iLabel].alignHoriz = 'center'
+        # Move main text
+        ratingScale.scaleDescription.pos = scaleTextPos
+        
+        self.ratingScales[layout] = ratingScale
+        return ratingScale
+
+vasWidgets = {} # window -> VasWidget
+def GetVasWidget(win):
+    if win not in vasWidgets:
+        vasWidgets[win] = VasWidget(win)
+    return vasWidgets[win]
+
+
+# Build the rating scales for a series of VAS questions ahead of time (e.g. before a run starts), so that ShowVAS 
+# doesn't have to. Inputs that affect the layout must match the ones later given to ShowVAS.
+def PrepareVAS(questions_list, options_list, win, upKey='up', downKey='down', selectKey='enter',textColor='black',
+               pos=(0.,0.),hideMouse=True,scaleTextPos=[0.,0.45], labelYPos=-0.27648, markerSize=0.1, tickHeight=0.0, 
+               tickLabelWidth=0.0):
+    vasWidget = GetVasWidget(win)
+    for iQ in range(len(questions_list)):
+        vasWidget.GetRatingScale(questions_list[iQ], options_list[iQ], 'Question%d'%iQ, float('inf'), upKey, downKey, 
+            selectKey, textColor, pos, hideMouse, scaleTextPos, labelYPos, markerSize, tickHeight, tickLabelWidth)
+
+
+# Show a series of VAS questions. Holding down upKey or downKey slides the marker at slideSpeed points per second 
+# (default: stepSize*60, the speed the marker has always moved at) after repeatDelay seconds.
+# If resultFile is a VasResults.VasResultFile, each question's results (including the marker position on every frame)
+# are also appended to it.
 def ShowVAS(questions_list, options_list, win, name='Question', questionDur=float('inf'), isEndedByKeypress=True, 
             upKey='up', downKey='down', selectKey='enter',textColor='black',pos=(0.,0.),stepSize=1.,hideMouse=True,
-            repeatDelay=0.5, scaleTextPos=[0.,0.45], labelYPos=-0.27648, markerSize=0.1, tickHeight=0.0, tickLabelWidth=0.0):
+            repeatDelay=0.5, scaleTextPos=[0.,0.45], labelYPos=-0.27648, markerSize=0.1, tickHeight=0.0, tickLabelWidth=0.0,
+            slideSpeed=None, resultFile=None):
     # import packages
-    from psychopy import visual # for ratingScale
-    import numpy as np # for tick locations
     from pyglet.window import key # for press-and-hold functionality
 
     # set up
@@ -29,9 +139,12 @@ def ShowVAS(questions_list, options_list, win, name='Question', questionDur=floa
     rating = [None]*nQuestions
     decisionTime = [None]*nQuestions
     choiceHistory = [[0]]*nQuestions
-    # Set up pyglet key handler
-    keyState=key.KeyStateHandler()
-    win.winHandle.push_handlers(keyState)
+    if slideSpeed is None:
+        slideSpeed = stepSize*60.
+    # Get VAS widget (and its pyglet key handler)
+    vasWidget = GetVasWidget(win)
+    keyState = vasWidget.keyState
+    trajectory = vasWidget.trajectory
     # Get attributes for key handler (put _ in front of numbers)
     if downKey[0].isdigit():
         downKey_attr = '_%s'%downKey
@@ -41,36 +154,23 @@ def ShowVAS(questions_list, options_list, win, name='Question', questionDur=floa
         upKey_attr = '_%s'%upKey
     else:
         upKey_attr = upKey
+    # Get display time of each question (on the log's clock) for resultFile
+    tDisplay = [None]*nQuestions
+    def SetDisplayTime(iQ):
+        tDisplay[iQ] = logging.defaultClock.getTime()
+    # Estimate frame period (refined with measured flip times below)
+    framePeriod = getattr(win,'monitorFramePeriod',None) or 1/60.
 
     # Rating Scale Loop
     for iQ in range(nQuestions):
-        # Make triangle
-        markerStim = visual.ShapeStim(win,lineColor=textColor,fillColor=textColor,vertices=((-markerSize/2.,markerSize*np.sqrt(5./4.)),(markerSize/2.,markerSize*np.sqrt(5./4.)),(0,0)),units='norm',closeShape=True,name='triangle');
-        
-        tickMarks = np.linspace(0,100,len(options_list[iQ])).tolist()
-        if tickLabelWidth==0.0: # if default value, determine automatically to fit all tick mark labels
-            tickWrapWidth = (tickMarks[1]-tickMarks[0])*0.9/100 # *.9 for extra space, /100 for norm units
-        else: # use user-specified value
-            tickWrapWidth = tickLabelWidth;
-        
-        ratingScale = visual.RatingScale(win, scale=questions_list[iQ], \
-            low=0., high=100., markerStart=50., precision=1., labels=options_list[iQ], tickMarks=tickMarks, tickHeight=tickHeight, \
-            marker=markerStim, markerColor=textColor, markerExpansion=1, singleClick=False, disappear=False, \
-            textSize=0.8, textColor=textColor, textFont='Helvetica Bold', showValue=False, \
-            showAccept=False, acceptKeys=selectKey, acceptPreText='key, click', acceptText='accept?', acceptSize=1.0, \
-            leftKeys=downKey, rightKeys=upKey, respKeys=(), lineColor=textColor, skipKeys=['q','escape'], \
-            mouseOnly=False, noMouse=hideMouse, size=2.0, stretch=1.0, pos=pos, minTime=0.4, maxTime=questionDur, \
-            flipVert=False, depth=0, name='%s%d'%(name,iQ), autoLog=True)
-        # Fix text wrapWidth
-        for iLabel in range(len(ratingScale.labels)):
-            ratingScale.labels[iLabel].wrapWidth = tickWrapWidth
-            ratingScale.labels[iLabel].pos  = (ratingScale.labels[iLabel].pos[0],labelYPos)
-            ratingScale.labels[iLabel].alignHoriz = 'center'
-        # Move main text
-        ratingScale.scaleDescription.pos = scaleTextPos
+        # Get rating scale for this question
+        ratingScale = vasWidget.GetRatingScale(questions_list[iQ], options_list[iQ], '%s%d'%(name,iQ), questionDur, 
+            upKey, downKey, selectKey, textColor, pos, hideMouse, scaleTextPos, labelYPos, markerSize, tickHeight, tickLabelWidth)
 
         # Display until time runs out (or key is pressed, if specified)
         win.logOnFlip(level=logging.EXP, msg='Display %s%d'%(name,iQ))
+        win.callOnFlip(SetDisplayTime,iQ)
+        trajectory.Reset()
         tStart = time.time()
         while (time.time()-tStart)<questionDur:
             # Look for keypresses
@@ -78,28 +178,35 @@ def ShowVAS(questions_list, options_list, win, name='Question', questionDur=floa
                 tPress = time.time()
                 valPress = ratingScale.markerPlacedAt
                 keyPressed = downKey_attr
-                step = -stepSize
+                step = -1
             elif keyState[getattr(key,upKey_attr)]: #returns True if the right key is pressed
                 tPress = time.time()
                 valPress = ratingScale.markerPlacedAt
                 keyPressed = upKey_attr
-                step = stepSize
+                step = 1
             else:
                 keyPressed = None
 
             # Handle sliding for held keys
+            tLastFlip = None
             while (keyPressed is not None) and ((time.time()-tStart)<questionDur):
-                # update time
-                durPress = time.time()-tPress
                 # update display
                 ratingScale.draw()
-                win.flip()
+                tFlipLog = win.flip()
+                if resultFile is not None:
+                    trajectory.Add(tFlipLog if tFlipLog is not None else logging.defaultClock.getTime(), ratingScale.markerPlacedAt)
+                # measure frame period
+                tFlip = time.time()
+                if tLastFlip is not None:
+                    framePeriod = 0.9*framePeriod + 0.1*(tFlip-tLastFlip)
+                tLastFlip = tFlip
                 # check for key release
                 if keyState[getattr(key,keyPressed)]==False:
                     break
-                # Update marker
+                # Update marker to where it should be when the next frame is displayed
+                durPress = tFlip + framePeriod - tPress
                 if durPress>repeatDelay:
-                    ratingScale.markerPlacedAt = valPress + (durPress-repeatDelay)*step*60 # *60 for refresh rate
+                    ratingScale.markerPlacedAt = valPress + (durPress-repeatDelay)*step*slideSpeed
                     ratingScale.markerPlacedAt = max(ratingScale.markerPlacedAt,ratingScale.low)
                     ratingScale.markerPlacedAt = min(ratingScale.markerPlacedAt,ratingScale.high)
             # Check for response
@@ -107,7 +214,9 @@ def ShowVAS(questions_list, options_list, win, name='Question', questionDur=floa
                 break
             # Redraw
             ratingScale.draw()
-            win.flip()
+            tFlipLog = win.flip()
+            if resultFile is not None:
+                trajectory.Add(tFlipLog if tFlipLog is not None else logging.defaultClock.getTime(), ratingScale.markerPlacedAt)
 
         # Log outputs
         rating[iQ] = ratingScale.getRating()
@@ -119,6 +228,12 @@ def ShowVAS(questions_list, options_list, win, name='Question', questionDur=floa
             logging.log(level=logging.DATA,msg='RatingScale %s: (no response) rating=%g'%(ratingScale.name,rating[iQ]))
             logging.log(level=logging.DATA,msg='RatingScale %s: rating RT=%g'%(ratingScale.name,decisionTime[iQ]))
             logging.log(level=logging.DATA,msg='RatingScale %s: history=%s'%(ratingScale.name,choiceHistory[iQ]))
+        # save typed results
+        if resultFile is not None:
+            resultFile.Append(ratingScale.name, rating[iQ], decisionTime[iQ], tDisplay[iQ], logging.defaultClock.getTime(), 
+                              ratingScale.noResponse, ratingScale.timedOut, choiceHistory[iQ], trajectory)
+            if trajectory.nDropped>0:
+                logging.warning('%s: VAS trajectory buffer full, oldest %d frames not saved'%(ratingScale.name,trajectory.nDropped))
 
 
     return rating,decisionTime,choiceHistory
@@ -0,0 +1,150 @@
+#!/usr/bin/env python2
+"""Write and read typed VAS result files, so analysis doesn't have to parse VAS results out of the log."""
+# VasResults.py
+# Created 10/16/26 by DJ.
+# Updated 10/16/26 by DJ - added TrajectoryBuffer, and each question's per-frame marker trajectory to the file.
+# Updated 10/16/26 by DJ - added a version header, written each time the file is opened.
+#
+# Each time a VasResultFile is opened, it writes a header (a record with the fields in vasHeaderFields) saying
+# which version of the format follows. RatingScales.ShowVAS(...,resultFile=VasResultFile(filename)) then adds one
+# record per question to the file: NumPy arrays written one after the other with np.save. The first is a record
+# with the fields in vasRecordFields, the second is the question's history (one row of [rating, time] per entry),
+# and the third (from version 2 on) is its trajectory: one row of [time, marker position] per frame displayed
+# (times are on the log's clock). Files from before the header (version 1: no trajectories) can still be read,
+# including ones a newer version appended to: each array's type says whether it's a record or a trajectory.
+# The file is flushed after each question, so everything up to a crash can be read back.
+# timeToFirstPress is the time of the second history entry, or RT if there's only one (as the log importers use it).
+# Usage:
+#   resultFile = VasResults.VasResultFile(VasResults.GetVasResultFile(logFilename))
+#   records,histories,trajectories = VasResults.ReadVasResultFile(VasResults.GetVasResultFile(logFilename))
+
+import numpy as np # for typed records
+import os # for file names
+
+vasFileVersion = 2 # 1: record & history (no header), 2: record, history & trajectory
+vasHeaderFields = [('format','U16'), ('version','i4')]
+vasRecordFields = [('name','U64'), ('rating','f8'), ('RT','f8'), ('timeToFirstPress','f8'), ('tStart','f8'), ('tEnd','f8'),
+                   ('noResponse','?'), ('timedOut','?')]
+
+
+# Get the name of the VAS result file that goes with a log file
+def GetVasResultFile(logFile):
+    return os.path.splitext(logFile)[0] + '-VasResults.dat'
+
+
+# --- RECORD A TRAJECTORY --- #
+# Ring buffer of [time, marker position] rows, allocated once so that adding a frame only writes into the array
+# (no lists or arrays are made during the render loop). If a question lasts more than capacity frames, 
+# the oldest frames are overwritten (nDropped says how many).
+class TrajectoryBuffer(object):
+    def __init__(self,capacity=2**16): # 2**16 frames = 18 minutes at 60Hz
+        self.capacity = capacity
+        self.buffer = np.zeros((capacity,2))
+        self.nFrames = 0
+
+    def Reset(self):
+        self.nFrames = 0
+
+    def Add(self,t,markerPos):
+        iFrame = self.nFrames % self.capacity
+        self.buffer[iFrame,0] = t
+        self.buffer[iFrame,1] = markerPos
+        self.nFrames += 1
+
+    @property
+    def nDropped(self):
+        return max(self.nFrames-self.capacity,0)
+
+    # Get the frames recorded since the last reset, oldest first
+    def GetFrames(self):
+        if self.nFrames<=self.capacity:
+            return self.buffer[:self.nFrames]
+        iOldest = self.nFrames % self.capacity
+        return np.concatenate((self.buffer[iOldest:],self.buffer[:iOldest]))
+
+
+# --- WRITE RECORDS --- #
+class VasResultFile(object):
+    def __init__(self,filename):
+        self.filename = filename
+        self.file = open(filename,'ab') # append, so a restarted task adds to the same file
+        # say which format the records after this follow (so files appended to across versions can be read)
+        np.save(self.file,np.array([('VasResults',vasFileVersion)],dtype=vasHeaderFields),allow_pickle=False)
+        self.file.flush()
+
+    # history is a RatingScale history: a list of (rating, time) pairs. None (e.g. no RT) is saved as NaN.
+    # trajectory is a TrajectoryBuffer (or None, saved as an empty trajectory).
+    def Append(self,name,rating,RT,tStart,tEnd,noResponse,timedOut,history,trajectory=None):
+        historyArray = np.array([[np.nan if value is None else value for value in entry] for entry in history],dtype=float).reshape(-1,2)
+        if len(historyArray)>1:
+            timeToFirstPress = historyArray[1,1]
+        else:
+            timeToFirstPress = np.nan if RT is None else RT # if no press, default to RT
+        record = np.array([(name, np.nan if rating is None else rating, np.nan if RT is None else RT, timeToFirstPress,
+                            np.nan if tStart is None else tStart, tEnd, noResponse, timedOut)],dtype=vasRecordFields)
+        np.save(self.file,record,allow_pickle=False)
+        np.save(self.file,historyArray,allow_pickle=False)
+        if trajectory is None:
+            np.save(self.file,np.zeros((0,2)),allow_pickle=False)
+        else:
+            np.save(self.file,trajectory.GetFrames(),allow_pickle=False)
+        self.file.flush()
+
+    def Close(self):
+        self.file.close()
+
+
+# --- READ RECORDS --- #
+# Files written before the header was added have no version to go by: most are version 1, but some
+# have trajectories. So the next array is only taken as this record's trajectory if it isn't a record or header.
+def ReadUnversionedTrajectory(f):
+    iStart = f.tell()
+    try:
+        array = np.load(f,allow_pickle=False)
+    except (ValueError,EOFError,IOError): # end of file
+        array = None
+    if array is None or array.dtype.names is not None:
+        f.seek(iStart) # leave it for the next record
+        return np.zeros((0,2))
+    return array
+
+
+# Returns (records,histories,trajectories): a structured array with the fields in vasRecordFields, a list of 
+# [rating, time] arrays and a list of [time, marker position] arrays (empty for version 1 records).
+# Raises a ValueError if the file has a header from a newer version than this one.
+def ReadVasResultFile(filename):
+    records = []
+    histories = []
+    trajectories = []
+    version = 1 # until a header says otherwise
+    with open(filename,'rb') as f:
+        while True:
+            try:
+                array = np.load(f,allow_pickle=False)
+            except (ValueError,EOFError,IOError): # end of file (or a record cut off by a crash)
+                break
+            if array.dtype.names==tuple(name for name,_ in vasHeaderFields):
+                version = int(array['version'][0])
+                if array['format'][0]!='VasResults' or version>vasFileVersion:
+                    raise ValueError('%s has records in format %s version %d, but this reader only knows VasResults versions 1-%d!'%
+                                     (filename,array['format'][0],version,vasFileVersion))
+                continue
+            if array.dtype.names is None:
+                raise ValueError('%s: expected a VAS record, found a %s array!'%(filename,array.dtype))
+            # the arrays that go with this record
+            try:
+                history = np.load(f,allow_pickle=False)
+                if version>=2:
+                    trajectory = np.load(f,allow_pickle=False)
+                else:
+                    trajectory = ReadUnversionedTrajectory(f)
+            except (ValueError,EOFError,IOError): # cut off by a crash
+                break
+            records.append(array)
+            histories.append(history)
+            trajectories.append(trajectory)
+    if records:
+        records = np.concatenate(records)
+    else:
+        records = np.zeros(0,dtype=vasRecordFields)
+    return records,histories,trajectories
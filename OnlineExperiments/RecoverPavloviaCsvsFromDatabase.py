@@ -6,57 +6,256 @@ Recover the .csv files of individual subjects from a multi-subject pavlovia data
 
 Created on Wed Apr 22 08:01:54 2020
 @author: jangrawdc
+Updated 10/16/26 by DJ - added --chunksize streaming mode (SplitDatabaseInChunks) for databases too big for memory.
+Updated 10/16/26 by DJ - split with one groupby pass, write files from a thread pool (--jobs), added --outFormat
+  (csv, csv.gz or parquet) and --bench.
+Updated 10/16/26 by DJ - chunked mode opens its files so that it runs on Python 2, participants are read as text
+  in both modes (so both give the same file names, e.g. 007_...).
+Updated 10/16/26 by DJ - subject groups are handed to the writers as they're needed, instead of all at once.
 """
 
 # Import packages
 import pandas as pd
 import numpy as np
 import os.path
+import sys # for the Python version
+import io # for text files with newline='' in Python 3
 import argparse
 import time
+from collections import OrderedDict # for the pool of open output files
+from multiprocessing.pool import ThreadPool # for writing files in parallel
+import threading # for limiting the groups waiting to be written
+import gzip # for compressed csv output
+import tempfile, shutil # for benchmarking
+
+# Output formats and their file extensions
+outExtensions = {'csv':'.csv', 'csv.gz':'.csv.gz', 'parquet':'.parquet'}
+
+def GetOutFile(subj,expName,datetime,outFormat='csv'):
+    """ Get the name of a subject's output file: <subj>_<experimentName>_<datetime>.csv (or .csv.gz/.parquet). """
+    return '%s_%s_%s%s'%(subj,expName,datetime,outExtensions[outFormat])
+
+
+def CheckOutFormat(outFormat):
+    """ Make sure outFormat is known and the packages it needs are installed. """
+    assert outFormat in outExtensions, 'Output format %s is not one of %s!'%(outFormat,sorted(outExtensions.keys()))
+    if outFormat=='parquet':
+        try:
+            import pyarrow
+        except ImportError:
+            try:
+                import fastparquet
+            except ImportError:
+                raise ImportError('Parquet output needs the pyarrow or fastparquet package.')
+
+
+def WriteSubjectFile(dfThis,outPath,outFormat='csv'):
+    """ Write one subject's data to outPath in the given format. """
+    if outFormat=='parquet':
+        dfThis.to_parquet(outPath,index=False)
+    else: # csv or csv.gz (pandas infers the compression from the extension)
+        dfThis.to_csv(outPath,index=False)
+    return outPath
+
+
+def OpenSubjectFile(outPath,mode='w',outFormat='csv'):
+    """ Open a subject's csv (or csv.gz) file to write (mode 'w') or append to (mode 'a') with to_csv.
+    Python 2's csv module writes byte strings, so the file is opened in binary mode there. In Python 3 it's
+    a text file with newline='', so that rows don't get extra line breaks on Windows. """
+    if sys.version_info[0]<3:
+        if outFormat=='csv.gz': # appending adds a gzip member, which readers treat as one stream
+            return gzip.open(outPath,mode+'b')
+        return open(outPath,mode+'b')
+    if outFormat=='csv.gz':
+        return io.TextIOWrapper(gzip.open(outPath,mode+'b'),encoding='utf-8',newline='')
+    return io.open(outPath,mode,encoding='utf-8',newline='')
+
 
 # Declare main function
-def RecoverPavloviaCsvsFromDatabase(dbFile,outFolder='.'):
+def RecoverPavloviaCsvsFromDatabase(dbFile,outFolder='.',chunksize=None,maxOpenFiles=64,nJobs=1,outFormat='csv',verbose=True):
     """ Recover the .csv files of individual subjects from a multi-subject pavlovia database.
     
     INPUTS:
     - dbFile is a Pavlovia database file (.csv) containing data from multiple subjects.
     - outFolder is the folder where individual subject output files should go (default: '.').
+    - chunksize is the number of rows to read at a time. If None (default), the whole file is read at once.
+      Otherwise, see SplitDatabaseInChunks.
+    - maxOpenFiles is the most output files to keep open at once in chunked mode (default: 64).
+    - nJobs is the number of threads writing subject files at once (default: 1). CSV formatting mostly holds
+      Python's GIL, so more threads help most with parquet output or slow (e.g. network) disks.
+    - outFormat is 'csv' (default), 'csv.gz' (gzip-compressed csv) or 'parquet' (needs pyarrow or fastparquet).
+    - verbose indicates whether each subject's file should be printed (default: True).
     
     OUTPUTS:
-    - A .csv file for each subject will be saved in outFolder, named <subj>_<experimentName>_<datetime>.csv.
+    - A .csv file for each subject will be saved in outFolder, named <subj>_<experimentName>_<datetime>.csv
+      (.csv.gz or .parquet for the other formats).
+    - outFiles is a list of the paths of the files written.
     """
     
     # Make sure file & folder exist
     assert os.path.exists(dbFile), 'Pavlovia database file %s does not exist!'%dbFile
     assert os.path.exists(outFolder), 'Output folder %s does not exist!'%outFolder
+    CheckOutFormat(outFormat)
+    
+    # Stream big files
+    if chunksize is not None:
+        return SplitDatabaseInChunks(dbFile,outFolder,chunksize,maxOpenFiles,outFormat,verbose)
     
     # Time processing
     tStart = time.time();
     
     # Import file
     print('===== Reading Pavlovia database file %s...'%dbFile)
-    dfAll = pd.read_csv(dbFile);
+    dfAll = pd.read_csv(dbFile,dtype={'participant':str}); # as text, like chunked mode (so e.g. 007 stays 007)
     
-    # Separate data
-    subjs = np.unique(dfAll.participant)
-    nSubj = np.size(subjs)
-    print('===== Separating data from %d subjects...'%nSubj)
-    for subj in subjs:
-        print('-- Subject %s'%subj)
-        dfThis = dfAll.loc[dfAll.participant==subj,:].reset_index(drop=True);
-        expName = dfThis['__experimentName'].values[0]
-        datetime = dfThis['__datetime'].values[0]
-        outFile = '%s_%s_%s.csv'%(subj,expName,datetime)
-        print('   Saving %s...'%outFile)
-        dfThis.to_csv('%s/%s'%(outFolder,outFile),index=False);
+    # Separate data in one pass (sorted by participant, like np.unique)
+    groups = dfAll.groupby('participant',sort=True)
+    print('===== Separating data from %d subjects...'%groups.ngroups)
+    # make each subject's write job as it's needed, so only the groups being written are copied out of dfAll
+    def GetJobs(slots=None):
+        for subj,dfThis in groups:
+            if slots is not None:
+                slots.acquire() # wait for a write to finish
+            expName = dfThis['__experimentName'].values[0]
+            datetime = dfThis['__datetime'].values[0]
+            outFile = GetOutFile(subj,expName,datetime,outFormat)
+            if verbose:
+                print('-- Subject %s: saving %s...'%(subj,outFile))
+            yield (dfThis,'%s/%s'%(outFolder,outFile),outFormat)
+    
+    # Write the files
+    if nJobs>1 and groups.ngroups>1:
+        nThreads = min(nJobs,groups.ngroups)
+        # the pool takes jobs from the generator as fast as it can, so limit how many are waiting or being written
+        slots = threading.Semaphore(2*nThreads)
+        def WriteJob(job):
+            try:
+                return WriteSubjectFile(*job)
+            finally:
+                slots.release()
+        pool = ThreadPool(nThreads)
+        try:
+            outFiles = list(pool.imap(WriteJob,GetJobs(slots)))
+        finally:
+            pool.close()
+            pool.join()
+    else: # write each file as its group comes up
+        outFiles = [WriteSubjectFile(*job) for job in GetJobs()]
     print('==== Done! Took %.1f seconds.'%(time.time()-tStart))    
+    return outFiles
+
+
+def SplitDatabaseInChunks(dbFile,outFolder='.',chunksize=100000,maxOpenFiles=64,outFormat='csv',verbose=True):
+    """ Recover the .csv files of individual subjects from a multi-subject pavlovia database, 
+    reading it a chunk of rows at a time so that memory use doesn't grow with the size of the database.
+    
+    INPUTS:
+    - dbFile is a Pavlovia database file (.csv) containing data from multiple subjects.
+    - outFolder is the folder where individual subject output files should go (default: '.').
+    - chunksize is the number of rows to read at a time (default: 100000).
+    - maxOpenFiles is the most output files to keep open at once (default: 64). When a chunk
+      has rows from a subject whose file isn't open, the least recently used file is closed.
+    - outFormat is 'csv' (default) or 'csv.gz'. Parquet files can't be appended to, so aren't supported here.
+    - verbose indicates whether each subject's file should be printed (default: True).
+    
+    OUTPUTS:
+    - A .csv file for each subject will be saved in outFolder, named <subj>_<experimentName>_<datetime>.csv
+      (using the subject's first row). Each chunk's rows are appended to the files of the subjects in it.
+      Cells are copied as text, exactly as they appear in the database. Rows without a participant are skipped.
+    - outFiles is a list of the paths of the files written.
+    """
+    
+    assert outFormat in ['csv','csv.gz'], 'Output format %s is not supported in chunked mode!'%outFormat
+    
+    # Time processing
+    tStart = time.time();
+    
+    print('===== Splitting Pavlovia database file %s in chunks of %d rows...'%(dbFile,chunksize))
+    outFiles = {} # output filename for each subject
+    openFiles = OrderedDict() # open file handles, least recently used first
+    nRows = 0
+    nSkipped = 0
+    try:
+        # read everything as text so values are written back out unchanged
+        for iChunk,dfChunk in enumerate(pd.read_csv(dbFile,chunksize=chunksize,dtype=str,keep_default_na=False)):
+            nRows += dfChunk.shape[0]
+            for subj,dfThis in dfChunk.groupby('participant',sort=False):
+                if subj=='':
+                    nSkipped += dfThis.shape[0]
+                    continue
+                # name the file from the subject's first row
+                isNewSubj = subj not in outFiles
+                if isNewSubj:
+                    expName = dfThis['__experimentName'].values[0]
+                    datetime = dfThis['__datetime'].values[0]
+                    outFiles[subj] = GetOutFile(subj,expName,datetime,outFormat)
+                    if verbose:
+                        print('-- Subject %s: saving %s...'%(subj,outFiles[subj]))
+                # get the subject's open file (overwriting any old file, then appending)
+                if subj in openFiles:
+                    openFiles[subj] = openFiles.pop(subj) # mark as most recently used
+                else:
+                    if len(openFiles)>=maxOpenFiles:
+                        openFiles.popitem(last=False)[1].close()
+                    outPath = '%s/%s'%(outFolder,outFiles[subj])
+                    openFiles[subj] = OpenSubjectFile(outPath,'w' if isNewSubj else 'a',outFormat)
+                dfThis.to_csv(openFiles[subj],index=False,header=isNewSubj)
+            print('   Read %d rows (chunk %d)...'%(nRows,iChunk+1))
+    finally:
+        for f in openFiles.values():
+            f.close()
+    if nSkipped>0:
+        print('WARNING: skipped %d rows with no participant.'%nSkipped)
+    print('==== Done! Split %d rows from %d subjects. Took %.1f seconds.'%(nRows,len(outFiles),time.time()-tStart))
+    return ['%s/%s'%(outFolder,outFile) for outFile in outFiles.values()]
+
+
+def WriteSyntheticDatabase(dbFile,nRows=1000000,nSubj=500,nCols=20):
+    """ Write a synthetic Pavlovia database with nRows trials spread over nSubj subjects (in random order)
+    and nCols numeric/text columns besides participant, __experimentName and __datetime. """
+    rng = np.random.RandomState(0)
+    subjs = rng.randint(nSubj,size=nRows)
+    dfDb = pd.DataFrame({'participant':np.char.add('s',subjs.astype(str))})
+    for iCol in range(nCols):
+        if iCol%2==0:
+            dfDb['value%d'%iCol] = rng.rand(nRows)
+        else:
+            dfDb['text%d'%iCol] = np.array(['left','right','none'])[rng.randint(3,size=nRows)]
+    dfDb['__experimentName'] = 'SyntheticTask'
+    dfDb['__datetime'] = '2020-04-22_' + pd.Series(subjs%24).map('{:02d}h00.00.000'.format) # one session time per subject
+    dfDb.to_csv(dbFile,index=False)
+
+
+def BenchmarkRecovery(nRows=1000000,nSubj=500,nJobs=1,outFormat='csv',chunksize=None,maxOpenFiles=64):
+    """ Time RecoverPavloviaCsvsFromDatabase on a synthetic database and print rows/s and MB/s. """
+    tempDir = tempfile.mkdtemp()
+    try:
+        dbFile = os.path.join(tempDir,'SyntheticDatabase.csv')
+        WriteSyntheticDatabase(dbFile,nRows,nSubj)
+        nMB = os.path.getsize(dbFile)/1e6
+        print('Wrote %d-row (%.1f MB) synthetic database with %d subjects.'%(nRows,nMB,nSubj))
+        outFolder = os.path.join(tempDir,'out')
+        os.mkdir(outFolder)
+        tStart = time.time()
+        RecoverPavloviaCsvsFromDatabase(dbFile,outFolder,chunksize,maxOpenFiles,nJobs,outFormat,verbose=False)
+        tElapsed = time.time()-tStart
+        print('=== outFormat=%s, jobs=%d, chunksize=%s: %.2f s (%.0f rows/s, %.1f MB/s)'%(outFormat,nJobs,chunksize,
+            tElapsed,nRows/tElapsed,nMB/tElapsed))
+    finally:
+        shutil.rmtree(tempDir)
 
 # %% Make command-line argument parser
 parser = argparse.ArgumentParser(description='Recover the .csv files of individual subjects from a multi-subject pavlovia database.')
 # Add arguments
-parser.add_argument('--dbFile', required=True, help='Pavlovia database file (.csv)')
+parser.add_argument('--dbFile', help='Pavlovia database file (.csv)')
 parser.add_argument('--outFolder', default='.', help='folder where individual subject output files should go')
+parser.add_argument('--chunksize', type=int, default=None, help='stream the database this many rows at a time (for files too big for memory)')
+parser.add_argument('--maxOpenFiles', type=int, default=64, help='most subject files to keep open at once in --chunksize mode')
+parser.add_argument('--jobs', type=int, default=1, help='number of threads writing subject files at once')
+parser.add_argument('--outFormat', default='csv', choices=sorted(outExtensions.keys()), help='format of the subject files')
+parser.add_argument('--bench', action='store_true', help='instead of recovering dbFile, time recovery of a synthetic database')
+parser.add_argument('--benchRows', type=int, default=1000000, help='number of rows in the --bench database')
+parser.add_argument('--benchSubjects', type=int, default=500, help='number of subjects in the --bench database')
 
 # %% ==== COMMAND-LINE MAIN FUNCTION ==== 
 
@@ -65,5 +264,10 @@ if __name__ == '__main__':
     # Parse inputs
     args = parser.parse_args();
  
-    # Import data
-    RecoverPavloviaCsvsFromDatabase(args.dbFile,args.outFolder)
\ No newline at end of file
+    if args.bench:
+        BenchmarkRecovery(args.benchRows,args.benchSubjects,args.jobs,args.outFormat,args.chunksize,args.maxOpenFiles)
+    elif args.dbFile is None:
+        parser.error('--dbFile is required (unless --bench is used).')
+    else:
+        # Import data
+        RecoverPavloviaCsvsFromDatabase(args.dbFile,args.outFolder,args.chunksize,args.maxOpenFiles,args.jobs,args.outFormat)
\ No newline at end of file
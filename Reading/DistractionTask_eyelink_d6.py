@@ -20,6 +20,7 @@
 # Updated 11/11/15 by DJ - added additional calibration parameters (changed name to _d6)
 # Updated 11/12/15 by DJ - switched to 1024x768 (max res of rear projector)
 # Updated 12/2/15 by DJ - adapted serial version back to EyeLink version
+# Updated 10/16/26 by DJ - EyeLink messages are sent from a background thread (TrackerMessageQueue) so they don't delay the next flip
 
 # Import packages
 from psychopy import core, gui, data, event, sound, logging #, visual # visual causes a bug in the guis, so I moved it down.
@@ -37,6 +38,7 @@ from LibSmi_PsychoPy import LibSmi_PsychoPy
 # Import eyelink libraries
 from pylink import *
 from EyeLinkCoreGraphicsPsychoPy import EyeLinkCoreGraphicsPsychoPy
+from TrackerMessages import TrackerMessageQueue
 #"""
 
 # ====================== #
@@ -337,6 +339,9 @@ else:
 # Ensure that the eye(s) selected during calibration is the one that gets used in the experiment.
 getEYELINK().sendCommand("select_eye_after_validation = NO")
 
+# Send messages from a background thread, so sending one on a flip doesn't delay the next frame
+tkMessages = TrackerMessageQueue(getEYELINK().sendMessage)
+
 # Check if we should exit
 if (eyelinktracker is not None and (not getEYELINK().isConnected() or getEYELINK().breakPressed())):
     CoolDown()
@@ -416,7 +421,7 @@ def SendMessage(message):
     if eyelinktracker is None:
         print('MSG: %s'%message)
     else:
-        getEYELINK().sendMessage(message)
+        tkMessages.Send(message) # stamped with the time of this call (the flip time if called with win.callOnFlip)
     #"""
     
     
@@ -523,6 +528,8 @@ def CoolDown():
     myTracker.cleanup()
     """
     #"""
+    # Send the messages still waiting
+    tkMessages.Close()
     # End EyeLink recording: add 100 msec of data to catch final events
     pylink.endRealTimeMode()
     pumpDelay(100)
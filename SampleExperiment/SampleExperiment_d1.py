@@ -3,6 +3,7 @@
 # SampleExperiment_d1.py
 # Created 11/09/15 by DJ based on DistractionTask_practice_d3.py
 # Updated 11/10/15 by DJ - cleaned up comments
+# Updated 10/16/26 by DJ - pre-render prompt pages with BasicPromptTools.PromptDeck
 
 from psychopy import core, gui, data, event, sound, logging 
 # from psychopy import visual # visual causes a bug in the guis, so it's declared after all GUIs run.
@@ -169,6 +170,10 @@ stimImage = visual.ImageStim(win, pos=[0,0], name='ImageStimulus',image=imageNam
 # read questions and answers from text files
 [topPrompts,bottomPrompts] = BasicPromptTools.ParsePromptFile(params['promptDir']+params['promptFile'])
 print('%d prompts loaded from %s'%(len(topPrompts),params['promptFile']))
+# render the prompt pages now so paging through them is instant
+promptDeck = BasicPromptTools.PromptDeck(win,message1,message2,topPrompts,bottomPrompts)
+if not params['skipPrompts']:
+    promptDeck.Render()
 
 # ============================ #
 # ======= SUBFUNCTIONS ======= #
@@ -250,7 +255,7 @@ def CoolDown():
 
 # display prompts
 if not params['skipPrompts']:
-    BasicPromptTools.RunPrompts(topPrompts,bottomPrompts,win,message1,message2)
+    BasicPromptTools.RunPrompts(topPrompts,bottomPrompts,win,message1,message2,deck=promptDeck)
 
 # wait for scanner
 message1.setText("Waiting for scanner to start...")